@@ -0,0 +1,179 @@
+"""Bulk loading of files with one integer per line.
+
+Parsing line by line with int(line) into a list is slow for big files.
+Here the file is read in large blocks (or through mmap), every block is
+split and converted with a single map(int, ...), and the result is kept in
+a compact array('l').
+
+A binary sidecar cache (file_name + '.ints') can be written next to the
+file. It holds a header identifying the source file and the raw integers,
+so it can be reloaded with one read, or mapped into memory without copying
+at all (map_ints).
+"""
+
+import array
+import ctypes
+import mmap
+import os
+import random
+import struct
+import tempfile
+
+# 64 bit signed integer on LP64 platforms, same as ctypes.c_long.
+_TYPECODE = 'l'
+_BLOCK_SIZE = 16 * 2**20
+_CACHE_SUFFIX = '.ints'
+_MAGIC = 'INTS0001'
+# magic, source size, source mtime, number of integers
+_HEADER = struct.Struct('<8sqdq')
+
+
+def _parse_blocks(read_block):
+    """Parse integers from blocks returned by read_block() until it returns
+    an empty string. A number may be split between two blocks."""
+    result = array.array(_TYPECODE)
+    tail = ''
+    while True:
+        block = read_block()
+        if not block:
+            break
+        if tail:
+            block = tail + block
+        cut = max(block.rfind('\n'), block.rfind('\r')) + 1
+        result.extend(map(int, block[:cut].split()))
+        tail = block[cut:]
+    result.extend(map(int, tail.split()))
+    return result
+
+
+def _parse_file(file_name, use_mmap, block_size):
+    with open(file_name, 'rb') as f:
+        if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+            return _parse_blocks(lambda: f.read(block_size))
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _parse_blocks(lambda: mm.read(block_size))
+        finally:
+            mm.close()
+
+
+def _cache_name(file_name):
+    return file_name + _CACHE_SUFFIX
+
+
+def _source_header(file_name, cnt):
+    st = os.stat(file_name)
+    return _HEADER.pack(_MAGIC, st.st_size, st.st_mtime, cnt)
+
+
+def _read_cache_header(file_name, f):
+    """Return the number of integers in cache file f, or None if it does not
+    belong to the current version of file_name."""
+    header = f.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        return None
+    magic, size, mtime, cnt = _HEADER.unpack(header)
+    if header != _source_header(file_name, cnt):
+        return None
+    return cnt
+
+
+def write_cache(file_name, a):
+    """Write the integers a parsed from file_name to its sidecar cache."""
+    a = array.array(_TYPECODE, a)
+    cache_name = _cache_name(file_name)
+    tmp_name = '%s.%d.tmp' % (cache_name, os.getpid())
+    with open(tmp_name, 'wb') as f:
+        f.write(_source_header(file_name, len(a)))
+        a.tofile(f)
+    # readers never see a half written cache
+    os.rename(tmp_name, cache_name)
+
+
+def load_ints(file_name, use_mmap=False, cache=False,
+              block_size=_BLOCK_SIZE):
+    """Return the integers in file_name, one per line, as an array('l').
+
+    With use_mmap, the file is read through mmap instead of read() calls.
+    With cache, a valid sidecar cache is loaded instead of parsing the file,
+    and one is written after parsing if there is none.
+    """
+    if cache:
+        try:
+            with open(_cache_name(file_name), 'rb') as f:
+                cnt = _read_cache_header(file_name, f)
+                if cnt is not None:
+                    a = array.array(_TYPECODE)
+                    a.fromfile(f, cnt)
+                    return a
+        except (IOError, EOFError):
+            pass
+    a = _parse_file(file_name, use_mmap, block_size)
+    if cache:
+        write_cache(file_name, a)
+    return a
+
+
+def map_ints(file_name):
+    """Return the integers in file_name as a ctypes array that maps the
+    sidecar cache into memory without copying, creating the cache first if
+    needed.
+
+    The mapping is copy on write: assigning to the array does not change
+    the cache file.
+    """
+    cache_name = _cache_name(file_name)
+    f = None
+    try:
+        f = open(cache_name, 'rb')
+        cnt = _read_cache_header(file_name, f)
+    except IOError:
+        cnt = None
+    if cnt is None:
+        if f is not None:
+            f.close()
+        write_cache(file_name, _parse_file(file_name, True, _BLOCK_SIZE))
+        f = open(cache_name, 'rb')
+        cnt = _read_cache_header(file_name, f)
+    try:
+        if cnt == 0:
+            return (ctypes.c_long * 0)()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    finally:
+        f.close()
+    # the ctypes array keeps mm alive
+    return (ctypes.c_long * cnt).from_buffer(mm, _HEADER.size)
+
+
+def test_load_ints(test_cnt=100):
+    tmp_dir = tempfile.mkdtemp()
+    file_name = os.path.join(tmp_dir, 'ints.txt')
+    try:
+        for _ in xrange(test_cnt):
+            problem = [random.randint(-2**62, 2**62)
+                       for _ in xrange(random.randint(0, 300))]
+            newline = random.choice(['\n', '\r\n'])
+            text = newline.join(str(x) for x in problem)
+            if problem and random.choice([True, False]):
+                text += newline
+            with open(file_name, 'wb') as f:
+                f.write(text)
+            # stale caches of the previous round must not be used
+            os.utime(file_name, (0, random.randint(0, 2**30)))
+
+            block_size = random.randint(1, 50)
+            assert load_ints(file_name, block_size=block_size).tolist() == \
+                problem
+            assert load_ints(file_name, use_mmap=True,
+                             block_size=block_size).tolist() == problem
+            assert load_ints(file_name, cache=True).tolist() == problem
+            assert load_ints(file_name, cache=True).tolist() == problem
+            assert map_ints(file_name)[:] == problem
+    finally:
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+
+if __name__ == '__main__':
+    test_load_ints()
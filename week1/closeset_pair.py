@@ -25,24 +25,93 @@ def closest_split_pair(Px, Py, delta):
     for q in Sy that is at most 7 places away from p:
       if d(p, q) < best:
         update best
+
+closest_pair_presorted sorts P by x and by y only once. Every level splits
+the y sorted list into its left and right halves in linear time, so the
+strip is already sorted by y and the whole run is O(n log n).
+
+For millions of points, a PointSet keeps the coordinates in two arrays
+instead of one tuple per point. closest_pair runs the same divide and
+conquer on it, comparing squared distances. The x order is an index
+permutation in an array('l'); instead of splitting the y order at every
+level, each level merges the y orders of its halves into a preallocated
+array('l') scratch buffer, so the working memory stays at two index arrays
+and a sorted copy of the columns.
 """
 
+import array
 import collections
 import itertools
 import math
 import random
+import resource
+import sys
+import time
 
 Inf = 10000000
 
 Point = collections.namedtuple('Point', 'x, y')
 
 
+class PointSet(object):
+    """Points stored as two parallel array columns of coordinates.
+
+    typecode is the array type of the columns. With the default 'd' the
+    coordinates are converted to float, which is exact for integers up to
+    2**53 only; use 'l' to keep integer points as they are.
+
+    >>> ps = PointSet([0, 0, 0], [0, 3, 4])
+    >>> len(ps), ps[1]
+    (3, Point(x=0.0, y=3.0))
+    >>> PointSet.from_points([Point(1, 2)]).xs
+    array('d', [1.0])
+    >>> PointSet.from_points([Point(1, 2**60 + 1)], 'l')[0]
+    Point(x=1, y=1152921504606846977)
+    """
+
+    def __init__(self, xs=(), ys=(), typecode='d'):
+        self.xs = array.array(typecode, xs)
+        self.ys = array.array(typecode, ys)
+        if len(self.xs) != len(self.ys):
+            raise ValueError('%s x coords but %s y coords' % (
+                len(self.xs), len(self.ys)))
+
+    @classmethod
+    def from_points(cls, P, typecode='d'):
+        ps = cls(typecode=typecode)
+        for p in P:
+            ps.append(p)
+        return ps
+
+    def append(self, p):
+        self.xs.append(p.x)
+        self.ys.append(p.y)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, i):
+        return Point(self.xs[i], self.ys[i])
+
+    def __iter__(self):
+        return itertools.starmap(Point, itertools.izip(self.xs, self.ys))
+
+
 def closest_pair(P):
     """Return a pair of points in P with least Eulidean distance.
 
     >>> closest_pair([(0, 0), (0, 3), (0, 4), (0, 6)])
     (1, (0, 3), (0, 4))
+
+    P can also be a PointSet:
+
+    >>> closest_pair(PointSet([0, 0, 0, 0], [0, 3, 4, 6]))
+    (1.0, (Point(x=0.0, y=3.0), Point(x=0.0, y=4.0)))
+    >>> closest_pair(PointSet([0, 0, 0, 0], [0, 3, 4, 6], 'l'))
+    (1.0, (Point(x=0, y=3), Point(x=0, y=4)))
     """
+    if isinstance(P, PointSet):
+        return _closest_pair_point_set(P)
     sort_by_x = sorted(P, key=lambda p: p.x)
     d, pair =  _closest_pair(sort_by_x)
     return (d, pair)
@@ -110,6 +179,183 @@ def _closest_split_pair(Px, half, delta):
     return (best_dist, best_pair)
 
 
+# Ranges with at most this many points are solved by brute force.
+_BRUTE_FORCE_SIZE = 8
+
+def closest_pair_presorted(P):
+    """Return a pair of points in P with least Eulidean distance in
+    O(n log n).
+
+    >>> closest_pair_presorted([Point(0, 0), Point(0, 3), Point(0, 4)])
+    (1.0, (Point(x=0, y=3), Point(x=0, y=4)))
+    """
+    Px = sorted(P, key=lambda p: p.x)
+    # indices into Px, sorted by y
+    Py = sorted(xrange(len(Px)), key=lambda i: Px[i].y)
+    return _closest_pair_presorted(Px, Py, 0, len(Px))
+
+def _closest_pair_presorted(Px, Py, start_ind, end_ind):
+    """Return the closest pair among Px[start_ind:end_ind].
+
+    Py holds the indices from start_ind to end_ind sorted by y cord.
+    """
+    if end_ind - start_ind <= _BRUTE_FORCE_SIZE:
+        best_dist = Inf
+        best_pair = None
+        for i in xrange(start_ind, end_ind):
+            for j in xrange(i + 1, end_ind):
+                d = _dist(Px[i], Px[j])
+                if d < best_dist:
+                    best_dist = d
+                    best_pair = (Px[i], Px[j])
+        return (best_dist, best_pair)
+
+    half = (start_ind + end_ind) // 2
+    left_Py = [i for i in Py if i < half]
+    right_Py = [i for i in Py if i >= half]
+
+    best_dist, best_pair = _closest_pair_presorted(Px, left_Py, start_ind,
+                                                   half)
+    d, pair = _closest_pair_presorted(Px, right_Py, half, end_ind)
+    if d < best_dist:
+        best_dist, best_pair = d, pair
+
+    # points less than best_dist away from the half point on x cord, still
+    # sorted by y cord
+    half_x = Px[half].x
+    Sy = [Px[i] for i in Py if abs(Px[i].x - half_x) < best_dist]
+    for i, p in enumerate(Sy):
+        for q in Sy[i + 1:i + 8]:
+            d = _dist(p, q)
+            if d < best_dist:
+                best_dist = d
+                best_pair = (p, q)
+    return (best_dist, best_pair)
+
+
+# _argsort sorts runs of this many indices with sorted(), so at most this
+# many of them are boxed Python objects at once.
+_ARGSORT_RUN = 4096
+
+
+def _merge_by(key, src, dst, start_ind, mid_ind, end_ind):
+    """Merge src[start_ind:mid_ind] and src[mid_ind:end_ind], indices sorted
+    by key, into dst[start_ind:end_ind]."""
+    i, j, k = start_ind, mid_ind, start_ind
+    while i < mid_ind and j < end_ind:
+        if key[src[j]] < key[src[i]]:
+            dst[k] = src[j]
+            j += 1
+        else:
+            dst[k] = src[i]
+            i += 1
+        k += 1
+    dst[k:end_ind] = src[i:mid_ind] if i < mid_ind else src[j:end_ind]
+
+
+def _argsort(key, aux):
+    """Return array('l') of the indices of key sorted by key, with aux, an
+    array('l') of len(key) items, as the merge buffer.
+
+    >>> _argsort([3.0, 1.0, 2.0, 1.0], array.array('l', [0]) * 4)
+    array('l', [1, 3, 2, 0])
+    """
+    n = len(key)
+    order = result = array.array('l', xrange(n))
+    for start_ind in xrange(0, n, _ARGSORT_RUN):
+        end_ind = min(start_ind + _ARGSORT_RUN, n)
+        order[start_ind:end_ind] = array.array(
+            'l', sorted(xrange(start_ind, end_ind), key=key.__getitem__))
+    width = _ARGSORT_RUN
+    while width < n:
+        for start_ind in xrange(0, n, 2 * width):
+            mid_ind = min(start_ind + width, n)
+            end_ind = min(start_ind + 2 * width, n)
+            _merge_by(key, order, aux, start_ind, mid_ind, end_ind)
+        order, aux = aux, order
+        width *= 2
+    # after an odd number of passes the order is in aux, which the caller
+    # keeps using as a separate buffer
+    if order is not result:
+        result[:] = order
+    return result
+
+
+def _closest_pair_point_set(ps):
+    """closest_pair_presorted on a PointSet.
+
+    The x order is an argsort into array('l'), the y order is rebuilt
+    bottom-up by merging into one preallocated array('l') scratch buffer,
+    so no level allocates Python lists of indices.
+    """
+    n = len(ps)
+    aux = array.array('l', [0]) * n
+    order = _argsort(ps.xs, aux)
+    X = array.array(ps.xs.typecode, (ps.xs[i] for i in order))
+    Y = array.array(ps.ys.typecode, (ps.ys[i] for i in order))
+    # order becomes the y order, aux the scratch buffer
+    d, pair = _closest_pair_columns(X, Y, order, aux, 0, n)
+    if pair is None:
+        return (Inf, None)
+    i, j = pair
+    return (math.sqrt(d), (Point(X[i], Y[i]), Point(X[j], Y[j])))
+
+def _closest_pair_columns(X, Y, Py, aux, start_ind, end_ind):
+    """Return (squared distance, (i, j)) of the closest pair among
+    indices start_ind to end_ind of the columns X, Y, which are sorted by
+    x, and leave those indices sorted by y in Py[start_ind:end_ind].
+
+    aux[start_ind:end_ind] is scratch space."""
+    best_dist = float('inf')
+    best_pair = None
+    if end_ind - start_ind <= _BRUTE_FORCE_SIZE:
+        for i in xrange(start_ind, end_ind):
+            for j in xrange(i + 1, end_ind):
+                d = (X[i] - X[j])**2 + (Y[i] - Y[j])**2
+                if d < best_dist:
+                    best_dist = d
+                    best_pair = (i, j)
+            # insertion sort of the range by y
+            k = i - 1
+            while k >= start_ind and Y[Py[k]] > Y[i]:
+                Py[k + 1] = Py[k]
+                k -= 1
+            Py[k + 1] = i
+        return (best_dist, best_pair)
+
+    half = (start_ind + end_ind) // 2
+    best_dist, best_pair = _closest_pair_columns(X, Y, Py, aux, start_ind,
+                                                 half)
+    d, pair = _closest_pair_columns(X, Y, Py, aux, half, end_ind)
+    if d < best_dist:
+        best_dist, best_pair = d, pair
+    _merge_by(Y, Py, aux, start_ind, half, end_ind)
+    Py[start_ind:end_ind] = aux[start_ind:end_ind]
+
+    # the strip, sorted by y, goes to aux[start_ind:strip_end]
+    half_x = X[half]
+    strip_end = start_ind
+    for i in Py[start_ind:end_ind]:
+        if (X[i] - half_x)**2 < best_dist:
+            aux[strip_end] = i
+            strip_end += 1
+    sx = array.array(X.typecode, (X[i] for i in aux[start_ind:strip_end]))
+    sy = array.array(Y.typecode, (Y[i] for i in aux[start_ind:strip_end]))
+    # compare every strip point with the one offset places after it, for
+    # each offset in a single pass over the strip columns
+    for offset in xrange(1, 8):
+        if offset >= len(sx):
+            break
+        dists = [(x1 - x2)**2 + (y1 - y2)**2 for x1, x2, y1, y2 in
+                 itertools.izip(sx, sx[offset:], sy, sy[offset:])]
+        d = min(dists)
+        if d < best_dist:
+            k = dists.index(d)
+            best_dist = d
+            best_pair = (aux[start_ind + k], aux[start_ind + k + offset])
+    return (best_dist, best_pair)
+
+
 def _brute_force(P):
     """Solve closest pair by brute force."""
     best_dist = Inf
@@ -143,7 +389,110 @@ def main():
         print dist1, pair1
         print dist2, pair2
         assert dist1 == dist2
+    test_closest_pair_presorted()
+    test_point_set()
+
+
+def test_closest_pair_presorted(test_cnt=200):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(0, 300)
+        problem = _gen_problem(problem_size)
+        if random.choice([True, False]):
+            # many duplicated and collinear points
+            problem = [Point(p.x % 5, p.y % 7) for p in problem]
+        dist1, pair1 = closest_pair_presorted(problem)
+        dist2, pair2 = _brute_force(problem)
+        assert dist1 == dist2, (dist1, dist2, problem)
+        if pair1 is not None:
+            assert _dist(*pair1) == dist1
+
+        dist3, pair3 = closest_pair(PointSet.from_points(problem))
+        assert dist3 == dist2, (dist3, dist2, problem)
+        if pair3 is not None:
+            assert _dist(*pair3) == dist3
+
+
+def test_point_set(sizes=(5000, 20000)):
+    # above _ARGSORT_RUN, so the x order is merged in an odd and an even
+    # number of passes
+    for size in sizes:
+        problem = [Point(random.random(), random.random())
+                   for _ in xrange(size)]
+        dist1, pair1 = closest_pair_presorted(problem)
+        dist2, pair2 = closest_pair(PointSet.from_points(problem))
+        assert dist2 == dist1, (size, dist1, dist2)
+        assert sorted(pair2) == sorted(pair1), (size, pair1, pair2)
+    # integer points above 2**53 come back unchanged from 'l' columns
+    for size in (2, 100, 5000):
+        problem = [Point(2**60 + random.randint(0, 10**6),
+                         2**60 + random.randint(0, 10**6))
+                   for _ in xrange(size)]
+        dist1, pair1 = closest_pair_presorted(problem)
+        dist2, pair2 = closest_pair(PointSet.from_points(problem, 'l'))
+        assert dist2 == dist1, (size, dist1, dist2)
+        assert sorted(pair2) == sorted(pair1), (size, pair1, pair2)
+
+
+def _bench_point_set_one(args):
+    """Solve closest pair on size random points, as Points with
+    closest_pair_presorted or as a PointSet with closest_pair. Return
+    (seconds, growth of peak RSS in KB, distance)."""
+    engine, size = args
+    random.seed(size)
+    if engine == 'PointSet':
+        problem = PointSet.from_points(
+            Point(random.random(), random.random()) for _ in xrange(size))
+        solver = closest_pair
+    else:
+        problem = [Point(random.random(), random.random())
+                   for _ in xrange(size)]
+        solver = closest_pair_presorted
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.time()
+    d, _ = solver(problem)
+    elapsed = time.time() - start_time
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, rss_after - rss_before, d
+
+
+def benchmark_point_set(size=10**6):
+    """Time closest_pair_presorted on Points against closest_pair on a
+    PointSet of the same points.
+
+    Every run happens in a fresh process so the peak RSS growth reported is
+    the memory allocated by that solver alone.
+    """
+    import multiprocessing
+    for engine in ('Point', 'PointSet'):
+        pool = multiprocessing.Pool(1)
+        elapsed, rss_kb, d = pool.apply(_bench_point_set_one,
+                                        ((engine, size),))
+        pool.close()
+        pool.join()
+        print '%8d %-8s %.2fs %10d KB (distance %s)' % (
+            size, engine, elapsed, rss_kb, d)
+
+
+def benchmark(sizes=(10**4, 10**5, 10**6)):
+    """Time closest_pair, closest_pair_presorted and, on small inputs,
+    _brute_force."""
+    for size in sizes:
+        problem = [Point(random.randint(-10**6, 10**6),
+                         random.randint(-10**6, 10**6))
+                   for _ in xrange(size)]
+        solvers = [closest_pair, closest_pair_presorted]
+        if size <= 10**4:
+            solvers.append(_brute_force)
+        for solver in solvers:
+            start_time = time.time()
+            d, _ = solver(problem)
+            print '%8d %-22s %.2fs (distance %s)' % (
+                size, solver.__name__, time.time() - start_time, d)
 
 
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
+        benchmark_point_set()
+    else:
+        main()
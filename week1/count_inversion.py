@@ -1,6 +1,13 @@
+import array
 import doctest
+import os
 import random
 import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import intfile
 
 """Counting inversions.
 Count number of pairs in an array that are in reverse order. E.g
@@ -22,6 +29,15 @@ def count_split_inversion(a, b):
       c[k] = b[j]
       j += 1
       inversion_cnt += len(a) - i
+
+inversion_cnt_bit counts the same thing without merging, using a Binary
+Indexed Tree (Fenwick tree) over the ranks of the values:
+
+def count_inversion(a):
+  replace every value by its rank among the distinct values of a
+  for i = n down to 1:
+    inversion_cnt += number of ranks < rank(a[i]) already in the tree
+    add rank(a[i]) to the tree
 """
 
 def inversion_cnt(a):
@@ -64,12 +80,15 @@ def _split_inversion(a, b):
 
     >>> _split_inversion([1], [])
     (0, [1])
+
+    >>> _split_inversion([1, 2], [1, 2])
+    (1, [1, 1, 2, 2])
     """
     inversion_cnt = 0
     c = []
     i, j = 0, 0
     for k in range(len(a) + len(b)):
-        if j >= len(b) or (i < len(a) and a[i] < b[j]):
+        if j >= len(b) or (i < len(a) and a[i] <= b[j]):
             c.append(a[i])
             i += 1
         else:
@@ -78,6 +97,61 @@ def _split_inversion(a, b):
             inversion_cnt += len(a) - i
     return (inversion_cnt, c)
 
+def _ranks(a):
+    """Return (ranks, order) for a. order is the indices of a sorted by
+    value, ranks[i] is the 1 based rank of a[i] among distinct values.
+
+    >>> ranks, order = _ranks([30, 10, 20, 10]); list(ranks), order
+    ([3, 1, 2, 1], [1, 3, 2, 0])
+    """
+    order = sorted(xrange(len(a)), key=a.__getitem__)
+    ranks = array.array('l', [0]) * len(a)
+    rank = 0
+    prev = None
+    for i in order:
+        if rank == 0 or a[i] != prev:
+            rank += 1
+            prev = a[i]
+        ranks[i] = rank
+    return ranks, order
+
+def inversion_cnt_bit(a, return_sorted=False):
+    """Count inversions in array a with a Binary Indexed Tree.
+
+    Uses O(n) integer memory and makes no copies of a. If return_sorted
+    is True, return (count, sorted a) like inversion_cnt does.
+
+    >>> inversion_cnt_bit([1, 2, 3, 5, 4])
+    1
+
+    >>> inversion_cnt_bit([6, 5, 4, 3, 2, 1])
+    15
+
+    >>> inversion_cnt_bit([1, 4, 2, 3, 5], return_sorted=True)
+    (2, [1, 2, 3, 4, 5])
+
+    >>> inversion_cnt_bit([2, 1, 2, 1])
+    3
+    """
+    ranks, order = _ranks(a)
+    # tree[r] holds the count of ranks in (r - lowbit(r), r]
+    tree = array.array('l', [0]) * (len(a) + 1)
+    size = len(tree)
+    cnt = 0
+    for i in xrange(len(a) - 1, -1, -1):
+        r = ranks[i]
+        # ranks smaller than r seen so far are to the right of a[i]
+        j = r - 1
+        while j > 0:
+            cnt += tree[j]
+            j -= j & -j
+        while r < size:
+            tree[r] += 1
+            r += r & -r
+    if return_sorted:
+        return (cnt, [a[i] for i in order])
+    return cnt
+
 def _brute_force(a):
     """Brute force to solve inversion count.
     >>> _brute_force([1, 2, 3, 5, 4])
@@ -115,13 +189,43 @@ def test_inversions(test_cnt=200):
         inversion_cnt2 = _brute_force(problem)
         assert inversion_cnt1 == inversion_cnt2
 
+def test_inversion_cnt_bit(test_cnt=200):
+    for _ in range(test_cnt):
+        problem_size = random.randint(0, 50)
+        problem = [random.randint(0, 10) for _ in range(problem_size)]
+        cnt, all_sorted = inversion_cnt_bit(problem, return_sorted=True)
+        assert cnt == _brute_force(problem) == inversion_cnt(problem)[0]
+        assert all_sorted == sorted(problem)
+
+def benchmark(file_name='IntegerArray.txt', sizes=(10**5, 10**6, 10**7)):
+    """Time inversion_cnt and inversion_cnt_bit on file_name and on random
+    permutations of the given sizes. _brute_force is O(n^2), so it only
+    runs on a 3000 item prefix of the file."""
+    problems = [(file_name, read_input(file_name))]
+    for size in sizes:
+        problem = range(size)
+        random.shuffle(problem)
+        problems.append(('random %d' % size, problem))
+
+    for name, problem in problems:
+        solvers = [('inversion_cnt', lambda a: inversion_cnt(a)[0]),
+                   ('inversion_cnt_bit', inversion_cnt_bit)]
+        if name == file_name:
+            problem_prefix = problem[:3000]
+            for solver_name, solver in solvers + [('_brute_force',
+                                                   _brute_force)]:
+                start_time = time.time()
+                cnt = solver(problem_prefix)
+                print '%s[:3000] %s: %s in %.2fs' % (
+                    name, solver_name, cnt, time.time() - start_time)
+        for solver_name, solver in solvers:
+            start_time = time.time()
+            cnt = solver(problem)
+            print '%s %s: %s in %.2fs' % (name, solver_name, cnt,
+                                          time.time() - start_time)
+
 def read_input(filename):
-    a = []
-    with open(filename) as f:
-        for line in f:
-            n = int(line)
-            a.append(n)
-    return a
+    return intfile.load_ints(filename).tolist()
 
 if __name__ == "__main__":
 
@@ -129,6 +233,9 @@ if __name__ == "__main__":
         # run test
         doctest.testmod()
         test_inversions(200)
+        test_inversion_cnt_bit(200)
+    elif sys.argv[1] == 'bench':
+        benchmark()
     else:
         cnt, _ = inversion_cnt(read_input(sys.argv[1]))
         print cnt
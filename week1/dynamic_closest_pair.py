@@ -0,0 +1,269 @@
+"""Closest pair of a point set that changes over time.
+
+Every point keeps its current nearest neighbor; the closest pair is the
+point with the nearest neighbor closest to it. In the plane a point is the
+nearest neighbor of at most 6 others: if it is the nearest neighbor of a
+and b, the angle between a and b seen from it is at least 60 degrees.
+
+Algorithm:
+def insert(p):
+  add p to the nearest neighbor index
+  p's neighbor = the nearest point to p
+  for each of the 8 cones of 45 degrees around p:
+    a = the nearest point to p in the cone, closer than the farthest
+        neighbor of any point
+    if p is closer to a than a's neighbor:
+      a's neighbor = p
+
+def delete(p):
+  remove p from the nearest neighbor index
+  for every (at most 6) a whose neighbor was p:
+    a's neighbor = the nearest point to a
+
+def closest_pair():
+  return the point with the least distance to its neighbor, and it
+
+Only the nearest point of a cone can get p as its new neighbor: any other
+a in the cone has a point b of the cone with |pb| <= |pa|, and then
+|ab| <= |pa| since the cone is narrower than 60 degrees. So an insert
+makes 2 index queries (one finds the nearest point of every cone) and a
+delete at most 6. Copies of a point are counted, not indexed, and make
+the closest pair distance 0.
+
+The nearest neighbor index is a set of static KD-trees of different sizes
+(the logarithmic method): inserting makes a tree with one point, and
+while the previous tree is not bigger than the last one the two are
+rebuilt as one. Deleted points are only marked; a tree is rebuilt once
+half of it is deleted. That is O(log n) trees to query and O(log^2 n)
+amortized rebuild cost per insert. The update bounds above count index
+queries; a query on one KD-tree is O(log n) for well spread points but
+O(sqrt n) in the worst case.
+"""
+
+import doctest
+import heapq
+import math
+import random
+
+from closeset_pair import Inf
+from closeset_pair import Point
+from closeset_pair import _brute_force
+from kdtree import KDTree
+
+
+class _Block(object):
+    """A KD-tree over some of the points, with the ids of its points and
+    the tree indices of the deleted ones."""
+
+    def __init__(self, ids, points):
+        self.ids = ids
+        self.tree = KDTree([points[i] for i in ids])
+        self.dead = set()
+
+    def live_ids(self):
+        return [i for ind, i in enumerate(self.ids) if ind not in self.dead]
+
+
+class DynamicClosestPair(object):
+    """Closest pair of a set of points under insertions and deletions.
+
+    The same point can be inserted several times, delete removes one copy.
+
+    >>> s = DynamicClosestPair()
+    >>> for p in [Point(0, 0), Point(5, 5), Point(1, 1)]: s.insert(p)
+    >>> s.closest_pair()
+    (1.4142135623730951, (Point(x=0, y=0), Point(x=1, y=1)))
+    >>> s.delete(Point(0, 0))
+    >>> s.closest_pair()
+    (5.656854249492381, (Point(x=5, y=5), Point(x=1, y=1)))
+    """
+
+    def __init__(self, points=()):
+        self._points = {}  # id -> point
+        self._ids = {}  # point -> id
+        self._copies = {}  # point -> number of copies, for points with 2+
+        self._len = 0
+        self._next_id = 0
+        self._blocks = []
+        self._where = {}  # id -> (block, index in block.tree)
+        self._neighbor = {}  # id -> (squared distance, neighbor id)
+        self._neighbor_of = {}  # id -> ids it is the neighbor of
+        self._heap = []  # (squared distance, id, neighbor id), may be stale
+        self._far_heap = []  # the same with -squared distance
+        for p in points:
+            self.insert(p)
+
+    def __len__(self):
+        return self._len
+
+    def _add_block(self, ids):
+        block = _Block(ids, self._points)
+        for ind, i in enumerate(ids):
+            self._where[i] = (block, ind)
+        return block
+
+    def _nearest(self, i):
+        """Return (squared distance, id) of the point nearest to point i,
+        or None if it is the only point."""
+        p = self._points[i]
+        best = None
+        for block in self._blocks:
+            # two results, so there is one besides p itself
+            for d, ind in block.tree._knn(p.x, p.y, 2, exclude=block.dead):
+                j = block.ids[ind]
+                if j != i:
+                    if best is None or d < best[0]:
+                        best = (d, j)
+                    break
+        return best
+
+    def _cone_nearest(self, p, max_sq_dist):
+        """Return, for each of the 8 cones around p, (squared distance, id)
+        of the point nearest to p in it and less than max_sq_dist away, or
+        None."""
+        best = [None] * 8
+        for block in self._blocks:
+            found = block.tree.cone_nearest(p.x, p.y, max_sq_dist,
+                                            block.dead)
+            for k, f in enumerate(found):
+                if f is not None and (best[k] is None or f[0] < best[k][0]):
+                    best[k] = (f[0], block.ids[f[1]])
+        return best
+
+    def _farthest_neighbor(self):
+        """Return the largest squared distance of a point to its neighbor,
+        inf if some point has none."""
+        if len(self._neighbor) < len(self._points):
+            return float('inf')
+        heap = self._far_heap
+        while heap:
+            d, i, j = heap[0]
+            if self._neighbor.get(i) == (-d, j):
+                return -d
+            heapq.heappop(heap)
+        return float('inf')
+
+    def _set_neighbor(self, i, neighbor):
+        old = self._neighbor.pop(i, None)
+        if old is not None:
+            self._neighbor_of[old[1]].discard(i)
+        if neighbor is None:
+            return
+        d, j = neighbor
+        self._neighbor[i] = neighbor
+        self._neighbor_of.setdefault(j, set()).add(i)
+        heapq.heappush(self._heap, (d, i, j))
+        heapq.heappush(self._far_heap, (-d, i, j))
+
+    def insert(self, p):
+        """Add point p."""
+        self._len += 1
+        if p in self._ids:
+            self._copies[p] = self._copies.get(p, 1) + 1
+            return
+        # only points closer to p than to their neighbor get p as neighbor
+        max_sq_dist = self._farthest_neighbor()
+        i = self._next_id
+        self._next_id += 1
+        self._points[i] = p
+        self._ids[p] = i
+
+        self._blocks.append(self._add_block([i]))
+        while (len(self._blocks) > 1 and
+               len(self._blocks[-2].ids) <= len(self._blocks[-1].ids)):
+            last = self._blocks.pop()
+            prev = self._blocks.pop()
+            self._blocks.append(self._add_block(prev.live_ids() +
+                                                last.live_ids()))
+        self._set_neighbor(i, self._nearest(i))
+        for found in self._cone_nearest(p, max_sq_dist):
+            if found is None:
+                continue
+            d, j = found
+            # a point alone before p has no neighbor yet
+            if j not in self._neighbor or d < self._neighbor[j][0]:
+                self._set_neighbor(j, (d, i))
+        self._compact_heaps()
+
+    def delete(self, p):
+        """Remove one copy of point p, raise KeyError if there is none."""
+        i = self._ids[p]
+        self._len -= 1
+        if p in self._copies:
+            self._copies[p] -= 1
+            if self._copies[p] == 1:
+                del self._copies[p]
+            return
+        del self._ids[p]
+        del self._points[i]
+
+        block, ind = self._where.pop(i)
+        block.dead.add(ind)
+        if len(block.dead) * 2 >= len(block.ids):
+            live_ids = block.live_ids()
+            k = self._blocks.index(block)
+            if live_ids:
+                self._blocks[k] = self._add_block(live_ids)
+            else:
+                del self._blocks[k]
+
+        self._set_neighbor(i, None)
+        for j in self._neighbor_of.pop(i, ()):
+            del self._neighbor[j]
+            self._set_neighbor(j, self._nearest(j))
+        self._compact_heaps()
+
+    def _compact_heaps(self):
+        """Drop the stale heap entries once they are the majority."""
+        if len(self._heap) > 2 * len(self._neighbor) + 16:
+            self._heap = [(d, j, k) for j, (d, k) in
+                          self._neighbor.iteritems()]
+            heapq.heapify(self._heap)
+            self._far_heap = [(-d, j, k) for d, j, k in self._heap]
+            heapq.heapify(self._far_heap)
+
+    def closest_pair(self):
+        """Return (distance, (p, q)) of the closest pair, (Inf, None) if
+        there are less than two points, like closest_pair."""
+        if self._copies:
+            p = next(self._copies.iterkeys())
+            return (0.0, (p, p))
+        heap = self._heap
+        while heap:
+            d, i, j = heap[0]
+            if self._neighbor.get(i) == (d, j):
+                return (math.sqrt(d), (self._points[i], self._points[j]))
+            heapq.heappop(heap)
+        return (Inf, None)
+
+
+def test_dynamic_closest_pair(test_cnt=50):
+    for _ in xrange(test_cnt):
+        coord_range = random.choice([3, 50, 1000])
+        s = DynamicClosestPair()
+        points = []
+        for _ in xrange(random.randint(0, 300)):
+            if points and random.random() < 0.4:
+                if random.random() < 0.5:
+                    # delete a point of the current best pair
+                    _, pair = s.closest_pair()
+                    p = random.choice(pair) if pair else points[0]
+                else:
+                    p = random.choice(points)
+                points.remove(p)
+                s.delete(p)
+            else:
+                p = Point(random.randint(0, coord_range),
+                          random.randint(0, coord_range))
+                points.append(p)
+                s.insert(p)
+            d, pair = s.closest_pair()
+            assert d == _brute_force(points)[0], (d, points)
+            assert len(s) == len(points)
+            # every point is the neighbor of at most 6 others
+            assert all(len(ids) <= 6 for ids in s._neighbor_of.itervalues())
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_dynamic_closest_pair()
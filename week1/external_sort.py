@@ -0,0 +1,202 @@
+"""External merge sort.
+
+Sort a file of integers, one per line, that is too big to be loaded into
+memory at once.
+
+Algorithm:
+def external_sort(input, output):
+  runs = []
+  while input is not exhausted:
+    chunk = read as many integers as fit in the memory budget
+    sort chunk and write it to a binary run file
+    runs.append(run file)
+  while len(runs) > fan_in:
+    merge every fan_in runs into a single run with a heap
+  merge the remaining runs into output
+
+Runs are merged in the order they were created and the heap merge takes
+from the earlier run on ties, so the sort is stable and ascending like
+_merge in mergesort.py.
+"""
+
+import argparse
+import array
+import heapq
+import itertools
+import os
+import random
+import sys
+import tempfile
+
+from mergesort import merge_sort_bottom_up
+
+# 64 bit signed integer on LP64 platforms.
+_TYPECODE = 'l'
+_ITEM_SIZE = array.array(_TYPECODE).itemsize
+
+
+def _read_chunks(f, chunk):
+    """Fill chunk with integers read from text file f, parsing one line at a
+    time, and yield the number of integers read each time it is full or
+    the file ends. The same array is reused for every chunk."""
+    cnt = 0
+    chunk_size = len(chunk)
+    for line in f:
+        chunk[cnt] = int(line)
+        cnt += 1
+        if cnt == chunk_size:
+            yield cnt
+            cnt = 0
+    if cnt:
+        yield cnt
+
+
+def _write_run(a, tmp_dir):
+    """Write a to a new binary run file in tmp_dir and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as f:
+        a.tofile(f)
+    return path
+
+
+def _iter_run(path, block_size):
+    """Yield integers of a binary run file, reading block_size at a time."""
+    with open(path, 'rb') as f:
+        while True:
+            block = array.array(_TYPECODE)
+            try:
+                block.fromfile(f, block_size)
+            except EOFError:
+                # fromfile keeps whatever it could read before the EOF
+                pass
+            if not block:
+                return
+            for x in block:
+                yield x
+
+
+def _merge_runs(paths, block_size):
+    """Return an iterator that merges the sorted run files in paths."""
+    return heapq.merge(*[_iter_run(path, block_size) for path in paths])
+
+
+def _write_merged(values, out, block_size):
+    """Write values to out as text, one integer per line."""
+    while True:
+        block = list(itertools.islice(values, block_size))
+        if not block:
+            return
+        out.write('\n'.join(map(str, block)))
+        out.write('\n')
+
+
+def external_sort(input_file, output_file, memory_budget=64 * 2**20,
+                  fan_in=64, tmp_dir=None):
+    """Sort integers in input_file into output_file, one integer per line.
+
+    memory_budget is the approximate number of bytes used for sorting
+    chunks and for the read buffers of the runs being merged.  fan_in is
+    the maximum number of runs merged at once, more runs are merged in
+    several passes.  Run files are created in tmp_dir (the system default
+    if None) and removed afterwards.  Return the number of runs created
+    from the input.
+    """
+    if fan_in < 2:
+        raise ValueError('fan_in must be at least 2, got %s' % fan_in)
+    # the chunk and merge_sort_bottom_up's auxiliary buffer share the budget;
+    # both are allocated once, at their full size, and reused
+    chunk_size = max(memory_budget // (2 * _ITEM_SIZE), 1)
+    # every run being merged plus the output gets one block
+    block_size = max(memory_budget // ((fan_in + 1) * _ITEM_SIZE), 1)
+
+    runs = []
+    try:
+        chunk = array.array(_TYPECODE, [0]) * chunk_size
+        aux = array.array(_TYPECODE, [0]) * chunk_size
+        with open(input_file) as f:
+            for cnt in _read_chunks(f, chunk):
+                if cnt < chunk_size:
+                    # the last chunk, chunk is not needed any more
+                    del chunk[cnt:]
+                merge_sort_bottom_up(chunk, aux)
+                runs.append(_write_run(chunk, tmp_dir))
+        del chunk, aux
+        run_cnt = len(runs)
+
+        while len(runs) > fan_in:
+            merged_runs = []
+            for i in xrange(0, len(runs), fan_in):
+                group = runs[i:i + fan_in]
+                merged = array.array(_TYPECODE)
+                fd, path = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+                with os.fdopen(fd, 'wb') as f:
+                    values = _merge_runs(group, block_size)
+                    while True:
+                        merged.extend(itertools.islice(values, block_size))
+                        if not merged:
+                            break
+                        merged.tofile(f)
+                        del merged[:]
+                merged_runs.append(path)
+                for run in group:
+                    os.remove(run)
+            runs = merged_runs
+
+        with open(output_file, 'w') as out:
+            _write_merged(_merge_runs(runs, block_size), out, block_size)
+    finally:
+        for run in runs:
+            if os.path.exists(run):
+                os.remove(run)
+    return run_cnt
+
+
+def test_external_sort(test_cnt=50):
+    tmp_dir = tempfile.mkdtemp()
+    input_file = os.path.join(tmp_dir, 'input.txt')
+    output_file = os.path.join(tmp_dir, 'output.txt')
+    try:
+        for _ in xrange(test_cnt):
+            problem_size = random.randint(0, 2000)
+            problem = [random.randint(-10**12, 10**12)
+                       for _ in xrange(problem_size)]
+            with open(input_file, 'w') as f:
+                for x in problem:
+                    f.write('%d\n' % x)
+            memory_budget = random.randint(1, 4000)
+            fan_in = random.randint(2, 8)
+            external_sort(input_file, output_file, memory_budget, fan_in,
+                          tmp_dir)
+            with open(output_file) as f:
+                result = [int(line) for line in f]
+            assert result == sorted(problem), (memory_budget, fan_in)
+        # nothing but input and output should be left behind
+        assert sorted(os.listdir(tmp_dir)) == ['input.txt', 'output.txt']
+    finally:
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Sort a file of integers, one per line, on disk.')
+    parser.add_argument('input_file')
+    parser.add_argument('output_file')
+    parser.add_argument('--memory', type=int, default=64 * 2**20,
+                        help='memory budget in bytes (default: 64MB)')
+    parser.add_argument('--fan-in', type=int, default=64,
+                        help='number of runs merged at once (default: 64)')
+    parser.add_argument('--tmp-dir', default=None,
+                        help='directory for the run files')
+    args = parser.parse_args(argv)
+    run_cnt = external_sort(args.input_file, args.output_file, args.memory,
+                            args.fan_in, args.tmp_dir)
+    print 'sorted %s runs into %s' % (run_cnt, args.output_file)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 1:
+        test_external_sort()
+    else:
+        main(sys.argv[1:])
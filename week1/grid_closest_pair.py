@@ -0,0 +1,125 @@
+"""Closest pair in expected linear time with a randomized grid.
+
+Algorithm (Rabin, Khuller-Matias):
+def grid_closest_pair(P):
+  shuffle P
+  delta = d(p1, p2)
+  grid = square cells of side delta, each holding the points inside it
+  for p in p3, p4, ... pn:
+    look for points closer than delta in the 3x3 cells around p
+    if one is found:
+      delta = distance to the closest of them
+      rebuild the grid with cells of side delta from p1 ... p
+    else:
+      add p to its cell
+
+A cell of side delta holds at most 4 points, so each step is O(1) without
+a rebuild. In random order the i-th point changes delta with probability
+at most 2/i, so the expected rebuild cost per point is O(1) as well.
+"""
+
+import doctest
+import random
+import sys
+import time
+
+from closeset_pair import Inf
+from closeset_pair import Point
+from closeset_pair import _brute_force
+from closeset_pair import _dist
+from closeset_pair import _gen_problem
+from closeset_pair import closest_pair_presorted
+
+
+def _sq_dist(p, q):
+    return (p.x - q.x)**2 + (p.y - q.y)**2
+
+
+def _cell(p, size):
+    return (int(p.x // size), int(p.y // size))
+
+
+def _build_grid(points, size):
+    """Return a dict from cell to the points in it, for cells of side size."""
+    grid = {}
+    for p in points:
+        grid.setdefault(_cell(p, size), []).append(p)
+    return grid
+
+
+def grid_closest_pair(P):
+    """Return a pair of points in P with least Eulidean distance in
+    expected O(n) time, in the same format as closest_pair.
+
+    >>> grid_closest_pair([Point(0, 0), Point(0, 3), Point(0, 4)])
+    (1.0, (Point(x=0, y=3), Point(x=0, y=4)))
+    >>> grid_closest_pair([Point(0, 0)])
+    (10000000, None)
+    """
+    points = list(P)
+    if len(points) < 2:
+        return (Inf, None)
+    random.shuffle(points)
+
+    # keep the order used by closest_pair, lower x first; sorting also
+    # makes ties on x independent of the shuffle
+    best_pair = tuple(sorted(points[:2]))
+    best_sq_dist = _sq_dist(*best_pair)
+    if best_sq_dist == 0:
+        return (0.0, best_pair)
+    size = _dist(*best_pair)
+    grid = _build_grid(points[:2], size)
+
+    for i in xrange(2, len(points)):
+        p = points[i]
+        cx, cy = _cell(p, size)
+        closer = None
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                for q in grid.get((x, y), ()):
+                    d = _sq_dist(p, q)
+                    if d < best_sq_dist:
+                        best_sq_dist = d
+                        closer = q
+        if closer is None:
+            grid.setdefault((cx, cy), []).append(p)
+            continue
+
+        best_pair = tuple(sorted((closer, p)))
+        if best_sq_dist == 0:
+            break
+        size = _dist(*best_pair)
+        grid = _build_grid(points[:i + 1], size)
+    return (_dist(*best_pair), best_pair)
+
+
+def test_grid_closest_pair(test_cnt=200):
+    for _ in xrange(test_cnt):
+        problem = _gen_problem(random.randint(0, 300))
+        if random.choice([True, False]):
+            # many duplicated and collinear points
+            problem = [Point(p.x % 5, p.y % 7) for p in problem]
+        dist1, pair1 = grid_closest_pair(problem)
+        dist2, _ = _brute_force(problem)
+        assert dist1 == dist2, (dist1, dist2, problem)
+        if pair1 is not None:
+            assert _dist(*pair1) == dist1
+
+
+def benchmark(sizes=(10**4, 10**5, 10**6)):
+    """Time grid_closest_pair against closest_pair_presorted."""
+    for size in sizes:
+        problem = [Point(random.random(), random.random())
+                   for _ in xrange(size)]
+        for solver in (closest_pair_presorted, grid_closest_pair):
+            start_time = time.time()
+            d, _ = solver(problem)
+            print '%8d %-22s %.2fs (distance %s)' % (
+                size, solver.__name__, time.time() - start_time, d)
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_grid_closest_pair()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
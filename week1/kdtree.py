@@ -0,0 +1,307 @@
+"""KD-tree for nearest neighbor queries on a fixed set of points.
+
+The tree is implicit in an array: the points of a range [lo, hi) are
+arranged so that the median on the split axis sits at mid = (lo + hi) / 2,
+smaller coordinates in [lo, mid) and larger ones in (mid, hi). The axis
+alternates between x and y level by level.
+
+Algorithm:
+def build(lo, hi, axis):
+  move the median of points[lo:hi] by axis to mid with quickselect
+  build(lo, mid, other axis)
+  build(mid + 1, hi, other axis)
+
+def k_nearest(q, k, lo, hi):
+  check the point at mid
+  search the side of the split containing q first
+  search the other side only if the split line is closer to q than the
+      k-th best distance found so far
+
+Every level of the build is O(n) in expectation, so building is
+O(n log n).
+
+cone_nearest finds the nearest point in each of the 8 cones of 45 degrees
+around a query point in one search. A subtree is skipped once it is
+farther than the nearest point found in every cone.
+"""
+
+import array
+import doctest
+import heapq
+import itertools
+import math
+import random
+import sys
+import time
+
+from closeset_pair import Point
+from closeset_pair import _dist
+
+
+def _cone(dx, dy):
+    """Return the cone of direction (dx, dy): k if its angle is in
+    [45k, 45(k + 1)) degrees, None for (0, 0).
+
+    >>> [_cone(1, 0), _cone(1, 1), _cone(0, 1), _cone(-1, -2), _cone(0, 0)]
+    [0, 1, 2, 5, None]
+    """
+    if dy > 0 or (dy == 0 and dx > 0):
+        if dx > 0:
+            return 0 if dy < dx else 1
+        return 2 if dy > -dx else 3
+    if dy == 0 and dx == 0:
+        return None
+    if dx < 0:
+        return 4 if dy > dx else 5
+    return 6 if dy < -dx else 7
+
+
+def _select(order, key, lo, hi, k):
+    """Rearrange order[lo:hi] so that order[k] is the item whose key would
+    be at k if the range was sorted by key, smaller keys before it and
+    larger keys after it."""
+    while hi - lo > 1:
+        pivot = key[order[random.randint(lo, hi - 1)]]
+        # three way partition: [lo, lt) < pivot, [lt, i) == pivot,
+        # (gt, hi) > pivot
+        lt, i, gt = lo, lo, hi - 1
+        while i <= gt:
+            v = key[order[i]]
+            if v < pivot:
+                order[lt], order[i] = order[i], order[lt]
+                lt += 1
+                i += 1
+            elif v > pivot:
+                order[gt], order[i] = order[i], order[gt]
+                gt -= 1
+            else:
+                i += 1
+        if k < lt:
+            hi = lt
+        elif k > gt:
+            lo = gt + 1
+        else:
+            return
+
+
+class KDTree(object):
+    """Static 2D tree over a list of points (anything with x and y).
+
+    Queries return the points themselves, _knn works on their indices in
+    self.points.
+
+    >>> t = KDTree([Point(0, 0), Point(5, 5), Point(1, 1), Point(9, 0)])
+    >>> t.nearest(Point(4, 4))
+    (1.4142135623730951, Point(x=5, y=5))
+    >>> t.k_nearest(Point(0, 0), 2)
+    [(0.0, Point(x=0, y=0)), (1.4142135623730951, Point(x=1, y=1))]
+    >>> t.radius(Point(0, 0), 2)
+    [(0.0, Point(x=0, y=0)), (1.4142135623730951, Point(x=1, y=1))]
+    >>> t.k_closest_pairs(1)
+    [(1.4142135623730951, (Point(x=0, y=0), Point(x=1, y=1)))]
+    """
+
+    def __init__(self, points):
+        self.points = list(points)
+        n = len(self.points)
+        xs = array.array('d', [p.x for p in self.points])
+        ys = array.array('d', [p.y for p in self.points])
+        order = array.array('l', xrange(n))
+        # split axis of the node at every position, 0 for x and 1 for y
+        self._axis = array.array('b', [0]) * n
+        stack = [(0, n, 0)]
+        while stack:
+            lo, hi, axis = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            _select(order, ys if axis else xs, lo, hi, mid)
+            self._axis[mid] = axis
+            stack.append((lo, mid, 1 - axis))
+            stack.append((mid + 1, hi, 1 - axis))
+        # point index and coordinates of every node, in tree order
+        self._order = order
+        self._xs = array.array('d', [xs[i] for i in order])
+        self._ys = array.array('d', [ys[i] for i in order])
+
+    def __len__(self):
+        return len(self.points)
+
+    def _knn(self, qx, qy, k, max_sq_dist=float('inf'), exclude=()):
+        """Return up to k (squared distance, index) of the points nearest to
+        (qx, qy) and at most max_sq_dist away, nearest first, skipping
+        indices in exclude."""
+        xs, ys, axes, order = self._xs, self._ys, self._axis, self._order
+        # max heap of the best k found so far, as (-squared distance, -index)
+        best = []
+        worst = max_sq_dist
+        stack = [(0, len(xs), 0.0)]
+        while stack:
+            lo, hi, bound = stack.pop()
+            if lo >= hi or bound > worst:
+                continue
+            mid = (lo + hi) // 2
+            dx = qx - xs[mid]
+            dy = qy - ys[mid]
+            d = dx * dx + dy * dy
+            if d <= worst and order[mid] not in exclude:
+                if len(best) < k:
+                    heapq.heappush(best, (-d, -order[mid]))
+                elif (-d, -order[mid]) > best[0]:
+                    heapq.heapreplace(best, (-d, -order[mid]))
+                if len(best) == k:
+                    worst = -best[0][0]
+            diff = dy if axes[mid] else dx
+            if diff < 0:
+                stack.append((mid + 1, hi, diff * diff))
+                stack.append((lo, mid, bound))
+            else:
+                stack.append((lo, mid, diff * diff))
+                stack.append((mid + 1, hi, bound))
+        return sorted((-d, -i) for d, i in best)
+
+    def cone_nearest(self, qx, qy, max_sq_dist=float('inf'), exclude=()):
+        """Return, for each of the 8 cones of 45 degrees around (qx, qy)
+        (see _cone), (squared distance, index) of the nearest point in it
+        less than max_sq_dist away, or None, skipping indices in exclude."""
+        xs, ys, axes, order = self._xs, self._ys, self._axis, self._order
+        best = [None] * 8
+        worst = [max_sq_dist] * 8
+        # a subtree farther than this can not improve any cone
+        bound = max_sq_dist
+        stack = [(0, len(xs), 0.0)]
+        while stack:
+            lo, hi, dist_bound = stack.pop()
+            if lo >= hi or dist_bound >= bound:
+                continue
+            mid = (lo + hi) // 2
+            dx = xs[mid] - qx
+            dy = ys[mid] - qy
+            d = dx * dx + dy * dy
+            if d < bound:
+                k = _cone(dx, dy)
+                if (k is not None and d < worst[k] and
+                        order[mid] not in exclude):
+                    best[k] = (d, order[mid])
+                    worst[k] = d
+                    bound = max(worst)
+            diff = dy if axes[mid] else dx
+            # diff < 0 puts the query past the split, low half is the far one
+            if diff < 0:
+                stack.append((lo, mid, diff * diff))
+                stack.append((mid + 1, hi, dist_bound))
+            else:
+                stack.append((mid + 1, hi, diff * diff))
+                stack.append((lo, mid, dist_bound))
+        return best
+
+    def _result(self, found):
+        return [(math.sqrt(d), self.points[i]) for d, i in found]
+
+    def nearest(self, q):
+        """Return (distance, point) of the point nearest to q, or
+        (inf, None) if the tree is empty."""
+        found = self.k_nearest(q, 1)
+        return found[0] if found else (float('inf'), None)
+
+    def k_nearest(self, q, k):
+        """Return (distance, point) of the k points nearest to q, nearest
+        first."""
+        if k <= 0:
+            return []
+        return self._result(self._knn(q.x, q.y, k))
+
+    def radius(self, q, r):
+        """Return (distance, point) of the points at most r away from q,
+        nearest first."""
+        return self._result(self._knn(q.x, q.y, len(self.points), r * r))
+
+    def nearest_many(self, queries):
+        """Return nearest(q) for every q in queries."""
+        return [self.nearest(q) for q in queries]
+
+    def k_nearest_many(self, queries, k):
+        """Return k_nearest(q, k) for every q in queries."""
+        return [self.k_nearest(q, k) for q in queries]
+
+    def k_closest_pairs(self, k):
+        """Return the k closest pairs of points as (distance, (p, q)),
+        closest first.
+
+        If (p, q) is one of the k closest pairs, q is one of the k nearest
+        neighbors of p, so a k nearest query per point finds all of them.
+        """
+        if k <= 0:
+            return []
+        points = self.points
+        candidates = set()
+        for i, p in enumerate(points):
+            for d, j in self._knn(p.x, p.y, k, exclude=(i,)):
+                candidates.add((d, min(i, j), max(i, j)))
+        return [(math.sqrt(d), (points[i], points[j]))
+                for d, i, j in heapq.nsmallest(k, candidates)]
+
+
+def _brute_force_k_nearest(P, q, k):
+    return sorted(_dist(p, q) for p in P)[:k]
+
+
+def test_kdtree(test_cnt=100):
+    for _ in xrange(test_cnt):
+        coord_range = random.choice([3, 100])
+        P = [Point(random.randint(0, coord_range),
+                   random.randint(0, coord_range))
+             for _ in xrange(random.randint(0, 100))]
+        t = KDTree(P)
+        k = random.randint(1, 10)
+        for _ in xrange(10):
+            q = Point(random.randint(-5, coord_range + 5),
+                      random.randint(-5, coord_range + 5))
+            assert ([d for d, _ in t.k_nearest(q, k)] ==
+                    _brute_force_k_nearest(P, q, k))
+            for d, p in t.k_nearest(q, k):
+                assert _dist(p, q) == d
+            r = random.uniform(0, coord_range)
+            assert (sorted(p for _, p in t.radius(q, r)) ==
+                    sorted(p for p in P if _dist(p, q) <= r))
+            for k, found in enumerate(t.cone_nearest(q.x, q.y)):
+                in_cone = [_dist(p, q) for p in P
+                           if _cone(p.x - q.x, p.y - q.y) == k]
+                if found is None:
+                    assert not in_cone
+                else:
+                    assert math.sqrt(found[0]) == min(in_cone)
+                    assert _cone(P[found[1]].x - q.x, P[found[1]].y - q.y) == k
+            dx, dy = q.x - coord_range / 2, q.y - coord_range / 2
+            if (dx, dy) != (0, 0):
+                angle = math.degrees(math.atan2(dy, dx)) % 360
+                assert _cone(dx, dy) == int(angle // 45), (dx, dy)
+        pairs = sorted(_dist(p, q) for p, q in itertools.combinations(P, 2))
+        assert [d for d, _ in t.k_closest_pairs(k)] == pairs[:k]
+
+
+def benchmark(size=10**5, query_cnt=1000):
+    """Time building a KDTree and nearest queries against brute force."""
+    P = [Point(random.random(), random.random()) for _ in xrange(size)]
+    queries = [Point(random.random(), random.random())
+               for _ in xrange(query_cnt)]
+    start_time = time.time()
+    t = KDTree(P)
+    print 'build %d points: %.2fs' % (size, time.time() - start_time)
+    start_time = time.time()
+    t.nearest_many(queries)
+    print '%d nearest queries: %.2fs' % (query_cnt, time.time() - start_time)
+    start_time = time.time()
+    for q in queries[:100]:
+        min(_dist(p, q) for p in P)
+    print '100 brute force queries: %.2fs' % (time.time() - start_time)
+    start_time = time.time()
+    t.k_closest_pairs(10)
+    print '10 closest pairs: %.2fs' % (time.time() - start_time)
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_kdtree()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
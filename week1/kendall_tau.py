@@ -0,0 +1,172 @@
+"""Kendall tau rank correlation.
+
+Compare two rankings of the same items. A pair of items is concordant if
+both rankings order it the same way and discordant if they order it in
+opposite ways. Pairs tied in a ranking are neither.
+
+  tau_b = (concordant - discordant) / sqrt((n0 - n1) * (n0 - n2))
+
+where n0 is the number of pairs, n1 and n2 the pairs tied in the first and
+the second ranking.
+
+Algorithm (Knight):
+def kendall_tau(a, b):
+  pairs = (rank of item in a, rank of item in b) for every item
+  sort pairs, count n1 (ties in a) and n3 (ties in both)
+  discordant, sorted_b = inversion_cnt(b ranks in that order)
+  count n2 (ties in b) on sorted_b
+  concordant - discordant = n0 - n1 - n2 + n3 - 2 * discordant
+"""
+
+import doctest
+import math
+import random
+
+from count_inversion import inversion_cnt
+
+
+def _rank_index(ranking):
+    """Return a dict from item to its rank.
+
+    ranking is either a sequence of distinct items, best first, or a dict
+    from item to a rank value where equal values are ties.
+
+    >>> sorted(_rank_index(['b', 'a']).items())
+    [('a', 1), ('b', 0)]
+    """
+    if isinstance(ranking, dict):
+        return ranking
+    index = {}
+    for rank, item in enumerate(ranking):
+        if item in index:
+            raise ValueError('%r is ranked twice' % (item,))
+        index[item] = rank
+    return index
+
+
+def _tied_pairs(sorted_values):
+    """Return the number of pairs of equal values in sorted_values.
+
+    >>> _tied_pairs([1, 1, 1, 2, 3, 3])
+    4
+    """
+    cnt = 0
+    run = 0
+    for i, x in enumerate(sorted_values):
+        if i > 0 and x == sorted_values[i - 1]:
+            run += 1
+            cnt += run
+        else:
+            run = 0
+    return cnt
+
+
+def _discordant(index_a, index_b):
+    """Return (discordant, n0, n1, n2, n3) for two rank indices."""
+    if len(index_a) != len(index_b):
+        raise ValueError('rankings have %s and %s items' % (
+            len(index_a), len(index_b)))
+    try:
+        pairs = sorted((index_a[item], rank_b)
+                       for item, rank_b in index_b.iteritems())
+    except KeyError as e:
+        raise ValueError('%r is only in the second ranking' % e.args)
+
+    n = len(pairs)
+    n0 = n * (n - 1) // 2
+    n1 = _tied_pairs([rank_a for rank_a, _ in pairs])
+    n3 = _tied_pairs(pairs)
+    discordant, sorted_b = inversion_cnt([rank_b for _, rank_b in pairs])
+    n2 = _tied_pairs(sorted_b)
+    return discordant, n0, n1, n2, n3
+
+
+def _tau_b(index_a, index_b):
+    discordant, n0, n1, n2, n3 = _discordant(index_a, index_b)
+    denominator = math.sqrt((n0 - n1) * (n0 - n2))
+    if denominator == 0:
+        # one ranking ties everything, correlation is undefined
+        return float('nan')
+    return (n0 - n1 - n2 + n3 - 2 * discordant) / denominator
+
+
+def kendall_tau(rank_a, rank_b):
+    """Return Kendall's tau-b between two rankings of the same items.
+
+    A ranking is a sequence of distinct hashable items, best first, or a
+    dict from item to a rank value where equal values are ties.
+
+    >>> kendall_tau(['a', 'b', 'c'], ['a', 'b', 'c'])
+    1.0
+    >>> kendall_tau(['a', 'b', 'c'], ['c', 'b', 'a'])
+    -1.0
+    >>> round(kendall_tau(['a', 'b', 'c', 'd'], ['a', 'c', 'b', 'd']), 6)
+    0.666667
+    >>> round(kendall_tau({'a': 1, 'b': 1, 'c': 2}, ['a', 'b', 'c']), 6)
+    0.816497
+    """
+    return _tau_b(_rank_index(rank_a), _rank_index(rank_b))
+
+
+def kendall_tau_distance(rank_a, rank_b):
+    """Return the number of pairs the two rankings order differently.
+
+    >>> kendall_tau_distance([1, 2, 3, 4, 5], [1, 4, 2, 3, 5])
+    2
+    """
+    discordant, _, _, _, _ = _discordant(_rank_index(rank_a),
+                                         _rank_index(rank_b))
+    return discordant
+
+
+def kendall_tau_many(reference, candidates):
+    """Return kendall_tau(reference, c) for every c in candidates, building
+    the rank index of reference once.
+
+    >>> kendall_tau_many(['a', 'b'], [['a', 'b'], ['b', 'a']])
+    [1.0, -1.0]
+    """
+    reference_index = _rank_index(reference)
+    return [_tau_b(reference_index, _rank_index(candidate))
+            for candidate in candidates]
+
+
+def _brute_force(rank_a, rank_b):
+    """Compute tau-b by comparing every pair of items."""
+    index_a = _rank_index(rank_a)
+    index_b = _rank_index(rank_b)
+    items = list(index_a)
+    score = n1 = n2 = n0 = 0
+    for i, p in enumerate(items):
+        for q in items[i + 1:]:
+            n0 += 1
+            da = cmp(index_a[p], index_a[q])
+            db = cmp(index_b[p], index_b[q])
+            n1 += da == 0
+            n2 += db == 0
+            score += da * db
+    denominator = math.sqrt((n0 - n1) * (n0 - n2))
+    if denominator == 0:
+        return float('nan')
+    return score / denominator
+
+
+def test_kendall_tau(test_cnt=300):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(2, 30)
+        items = ['item%d' % i for i in xrange(problem_size)]
+        rank_a = dict((item, random.randint(0, 5)) for item in items)
+        random.shuffle(items)
+        rank_b = random.choice([items, dict((item, random.randint(0, 5))
+                                            for item in items)])
+        tau1 = kendall_tau(rank_a, rank_b)
+        tau2 = _brute_force(rank_a, rank_b)
+        assert (math.isnan(tau1) and math.isnan(tau2) or
+                abs(tau1 - tau2) < 1e-9), (tau1, tau2)
+        tau3 = kendall_tau_many(rank_a, [rank_b, rank_a])[0]
+        assert repr(tau3) == repr(tau1), (tau3, tau1)
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_kendall_tau()
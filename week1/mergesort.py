@@ -11,8 +11,28 @@
          else:
             c[k] = b[j]
             j += 1
+
+Bottom-up merge sort (merge_sort_bottom_up) does the same work without
+recursion or sub lists:
+
+   sort every run of RUN items with insertion sort
+   width = RUN
+   while width < n:
+     merge each pair of adjacent runs of size width from src into dst
+     swap src and dst
+     width *= 2
+   copy back to a if the result ended up in the auxiliary buffer
 """
 
+import array
+import random
+import resource
+import sys
+import time
+
+# Runs shorter than this are sorted with insertion sort before merging.
+_RUN = 16
+
 def _merge(a, b):
     """Merge a and b in sorting order.
 
@@ -31,7 +51,7 @@ def _merge(a, b):
     c = []
     i, j = 0, 0
     for k in range(size):
-        if j >= len(b) or (i < len(a) and a[i] < b[j]):
+        if j >= len(b) or (i < len(a) and a[i] <= b[j]):
             c.append(a[i])
             i += 1
         else:
@@ -54,8 +74,103 @@ def merge_sort(a):
     return _merge(merge_sort(a[:half_point]), merge_sort(a[half_point:]))
 
 
+def _insertion_sort(a, start_ind, end_ind):
+    """Sort a[start_ind:end_ind] in place with insertion sort."""
+    for i in xrange(start_ind + 1, end_ind):
+        x = a[i]
+        j = i - 1
+        while j >= start_ind and a[j] > x:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+def _merge_into(src, dst, start_ind, mid_ind, end_ind, dst_shift=0):
+    """Merge the sorted runs src[start_ind:mid_ind] and src[mid_ind:end_ind]
+    into dst[start_ind + dst_shift:end_ind + dst_shift]."""
+    i, j, k = start_ind, mid_ind, start_ind + dst_shift
+    while i < mid_ind and j < end_ind:
+        x = src[i]
+        y = src[j]
+        if x <= y:
+            dst[k] = x
+            i += 1
+        else:
+            dst[k] = y
+            j += 1
+        k += 1
+    while i < mid_ind:
+        dst[k] = src[i]
+        i += 1
+        k += 1
+    while j < end_ind:
+        dst[k] = src[j]
+        j += 1
+        k += 1
+
+
+def merge_sort_bottom_up(a, aux=None, start_ind=0, end_ind=None):
+    """Sort a[start_ind:end_ind] in place with an iterative bottom-up merge
+    sort and return a.
+
+    Only one auxiliary buffer of end_ind - start_ind items is allocated,
+    the merges bounce between a and that buffer.  a can be a list or any
+    other mutable sequence such as array.array, a shared memory array or a
+    memoryview of a bytearray. aux, if given, is used as the auxiliary
+    buffer and must hold at least end_ind - start_ind items.
+
+    >>> merge_sort_bottom_up([1, 3, 2, 4])
+    [1, 2, 3, 4]
+    >>> merge_sort_bottom_up(array.array('l', [4, 3, 2, 1]))
+    array('l', [1, 2, 3, 4])
+    >>> merge_sort_bottom_up([])
+    []
+    >>> merge_sort_bottom_up([9, 3, 2, 1, 0], start_ind=1, end_ind=4)
+    [9, 1, 2, 3, 0]
+    >>> data = bytearray([5, 4, 3, 2, 1] * 10)
+    >>> _ = merge_sort_bottom_up(memoryview(data))
+    >>> list(data) == sorted([5, 4, 3, 2, 1] * 10)
+    True
+    """
+    if end_ind is None:
+        end_ind = len(a)
+    n = end_ind - start_ind
+    for run_start in xrange(start_ind, end_ind, _RUN):
+        _insertion_sort(a, run_start, min(run_start + _RUN, end_ind))
+    if n <= _RUN:
+        return a
+
+    if aux is None:
+        # a slice of a memoryview is a view of a, not a copy
+        if isinstance(a, memoryview):
+            aux = list(a[start_ind:end_ind])
+        else:
+            aux = a[start_ind:end_ind]
+    # the range sits at start_ind in a and at 0 in aux
+    src, dst = a, aux
+    src_base, dst_base = start_ind, 0
+    width = _RUN
+    while width < n:
+        for run_start in xrange(0, n, 2 * width):
+            mid_ind = min(run_start + width, n)
+            run_end = min(run_start + 2 * width, n)
+            _merge_into(src, dst, src_base + run_start, src_base + mid_ind,
+                        src_base + run_end, dst_base - src_base)
+        src, dst = dst, src
+        src_base, dst_base = dst_base, src_base
+        width *= 2
+
+    if src is not a:
+        if isinstance(a, memoryview) and not isinstance(src, memoryview):
+            # a memoryview only takes buffers in slice assignment
+            for k in xrange(n):
+                a[start_ind + k] = src[k]
+        else:
+            a[start_ind:end_ind] = src[:n]
+    return a
+
+
 def test_merge_sort(test_cnt):
-    import random
     for _ in range(test_cnt):
         problem_size = random.randint(10, 3000)
         problem = range(problem_size)
@@ -63,7 +178,63 @@ def test_merge_sort(test_cnt):
         assert merge_sort(problem) == sorted(problem)
 
 
+def test_merge_sort_bottom_up(test_cnt):
+    for _ in range(test_cnt):
+        problem_size = random.randint(0, 3000)
+        problem = [random.randint(-100, 100) for _ in xrange(problem_size)]
+        expected = merge_sort(problem)
+        assert merge_sort_bottom_up(problem[:]) == expected
+        typed = array.array('l', problem)
+        assert merge_sort_bottom_up(typed).tolist() == expected
+        start_ind = random.randint(0, problem_size)
+        end_ind = random.randint(start_ind, problem_size)
+        a = merge_sort_bottom_up(problem[:], None, start_ind, end_ind)
+        assert a == (problem[:start_ind] + sorted(problem[start_ind:end_ind]) +
+                     problem[end_ind:])
+        data = bytearray(x % 256 for x in problem)
+        merge_sort_bottom_up(memoryview(data))
+        assert list(data) == sorted(x % 256 for x in problem)
+
+
+def _bench_one(args):
+    """Sort a random array of given size with the named engine. Return
+    (seconds, growth of peak RSS in KB) of the sort."""
+    engine, size = args
+    random.seed(size)
+    if engine == 'merge_sort':
+        a = [random.randint(0, size) for _ in xrange(size)]
+        sort_func = merge_sort
+    else:
+        a = array.array('l', (random.randint(0, size) for _ in xrange(size)))
+        sort_func = merge_sort_bottom_up
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.time()
+    sort_func(a)
+    elapsed = time.time() - start_time
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, rss_after - rss_before
+
+
+def benchmark(sizes=(10**5, 10**6, 10**7)):
+    """Compare merge_sort with merge_sort_bottom_up.
+
+    Every run happens in a fresh process so the peak RSS growth reported is
+    the memory allocated by that sort alone.
+    """
+    import multiprocessing
+    for size in sizes:
+        for engine in ('merge_sort', 'merge_sort_bottom_up'):
+            pool = multiprocessing.Pool(1)
+            elapsed, rss_kb = pool.apply(_bench_one, ((engine, size),))
+            pool.close()
+            pool.join()
+            print '%10d %-22s %8.2fs %10d KB' % (size, engine, elapsed, rss_kb)
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
     test_merge_sort(100)
+    test_merge_sort_bottom_up(100)
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
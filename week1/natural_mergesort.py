@@ -0,0 +1,290 @@
+"""Adaptive natural merge sort.
+
+Instead of always splitting in halves, use the runs already present in the
+input, like Timsort.
+
+Algorithm:
+def natural_merge_sort(a):
+  runs = []
+  while not at the end of a:
+    run = longest non-descending or strictly descending run from here
+    reverse run if it is descending
+    extend run to min_run items with binary insertion sort
+    push run to runs
+    merge runs on top of the stack until, for the top runs A, B, C
+      len(A) > len(B) + len(C) and len(B) > len(C)
+  merge all remaining runs
+
+Merging two runs copies the left one aside and merges it back one item
+at a time.  When one side wins MIN_GALLOP times in a row the merge switches
+to galloping: exponential search for how many items the winning side
+contributes in a row and move them as a block.
+
+Already sorted input is a single run, so it is sorted in O(n).
+"""
+
+import bisect
+import random
+import sys
+import time
+
+# Number of consecutive wins of one side before a merge starts galloping.
+MIN_GALLOP = 7
+
+
+def _min_run(n):
+    """Return the minimum run length for n items, between 32 and 64 so
+    that n / min_run is close to a power of 2.
+
+    >>> _min_run(63)
+    63
+    >>> _min_run(64)
+    32
+    >>> _min_run(65)
+    33
+    """
+    r = 0
+    while n >= 64:
+        r |= n & 1
+        n >>= 1
+    return n + r
+
+
+def _count_run(a, lo, hi):
+    """Return end of the run starting at lo, reversing it first if it is
+    strictly descending.
+
+    >>> a = [3, 2, 1, 4]; _count_run(a, 0, 4), a
+    (3, [1, 2, 3, 4])
+    >>> a = [1, 1, 2, 0]; _count_run(a, 0, 4), a
+    (3, [1, 1, 2, 0])
+    """
+    run_hi = lo + 1
+    if run_hi == hi:
+        return hi
+    if a[run_hi] < a[lo]:
+        # strictly descending, so reversing it keeps the sort stable
+        while run_hi < hi and a[run_hi] < a[run_hi - 1]:
+            run_hi += 1
+        a[lo:run_hi] = a[lo:run_hi][::-1]
+    else:
+        while run_hi < hi and a[run_hi] >= a[run_hi - 1]:
+            run_hi += 1
+    return run_hi
+
+
+def _binary_insertion_sort(a, lo, hi, start):
+    """Sort a[lo:hi] where a[lo:start] is already sorted."""
+    for i in xrange(start, hi):
+        x = a[i]
+        pos = bisect.bisect_right(a, x, lo, i)
+        if pos < i:
+            a[pos + 1:i + 1] = a[pos:i]
+            a[pos] = x
+
+
+def _gallop_left(key, a, lo, hi):
+    """Return the first index i in sorted a[lo:hi] with a[i] >= key,
+    probing lo, lo + 1, lo + 3, lo + 7 ... before a binary search.
+
+    >>> _gallop_left(3, [1, 2, 3, 3, 4], 0, 5)
+    2
+    >>> _gallop_left(5, [1, 2, 3, 3, 4], 0, 5)
+    5
+    """
+    bound = 1
+    while lo + bound <= hi and a[lo + bound - 1] < key:
+        bound *= 2
+    return bisect.bisect_left(a, key, lo + bound // 2, min(lo + bound, hi))
+
+
+def _gallop_right(key, a, lo, hi):
+    """Return the first index i in sorted a[lo:hi] with a[i] > key,
+    probing lo, lo + 1, lo + 3, lo + 7 ... before a binary search.
+
+    >>> _gallop_right(3, [1, 2, 3, 3, 4], 0, 5)
+    4
+    >>> _gallop_right(0, [1, 2, 3, 3, 4], 0, 5)
+    0
+    """
+    bound = 1
+    while lo + bound <= hi and a[lo + bound - 1] <= key:
+        bound *= 2
+    return bisect.bisect_right(a, key, lo + bound // 2, min(lo + bound, hi))
+
+
+def _merge_runs(a, lo, mid, hi, min_gallop):
+    """Merge the sorted runs a[lo:mid] and a[mid:hi] in place. Return the
+    adjusted min_gallop."""
+    # items of the left run that are <= the first right item are in place
+    lo = _gallop_right(a[mid], a, lo, mid)
+    if lo == mid:
+        return min_gallop
+    # items of the right run that are >= the last left item are in place
+    hi = _gallop_left(a[mid - 1], a, mid, hi)
+
+    tmp = a[lo:mid]
+    n1 = len(tmp)
+    i, j, k = 0, mid, lo
+    while i < n1 and j < hi:
+        # one item at a time until one side keeps winning
+        cnt1 = cnt2 = 0
+        while i < n1 and j < hi:
+            if a[j] < tmp[i]:
+                a[k] = a[j]
+                j += 1
+                cnt2 += 1
+                cnt1 = 0
+            else:
+                a[k] = tmp[i]
+                i += 1
+                cnt1 += 1
+                cnt2 = 0
+            k += 1
+            if cnt1 >= min_gallop or cnt2 >= min_gallop:
+                break
+
+        # galloping, move blocks until neither side wins MIN_GALLOP in a row
+        while i < n1 and j < hi:
+            p = _gallop_right(a[j], tmp, i, n1)
+            cnt1 = p - i
+            a[k:k + cnt1] = tmp[i:p]
+            k += cnt1
+            i = p
+            if i == n1:
+                break
+            p = _gallop_left(tmp[i], a, j, hi)
+            cnt2 = p - j
+            a[k:k + cnt2] = a[j:p]
+            k += cnt2
+            j = p
+            if cnt1 < MIN_GALLOP and cnt2 < MIN_GALLOP:
+                min_gallop += 1
+                break
+            min_gallop = max(1, min_gallop - 1)
+
+    # whatever is left of the right run is already in place
+    a[k:k + n1 - i] = tmp[i:n1]
+    return min_gallop
+
+
+def natural_merge_sort(a):
+    """Sort a in place with an adaptive natural merge sort and return it.
+
+    a can be a list or any other mutable sequence such as array.array.
+
+    >>> natural_merge_sort([1, 3, 2, 4])
+    [1, 2, 3, 4]
+    >>> natural_merge_sort([4, 3, 2, 1])
+    [1, 2, 3, 4]
+    >>> natural_merge_sort([])
+    []
+    """
+    n = len(a)
+    if n < 2:
+        return a
+    min_run = _min_run(n)
+    min_gallop = MIN_GALLOP
+    # stack of (start, length) of pending runs
+    runs = []
+    lo = 0
+    while lo < n:
+        hi = _count_run(a, lo, n)
+        if hi - lo < min_run:
+            forced_hi = min(lo + min_run, n)
+            _binary_insertion_sort(a, lo, forced_hi, hi)
+            hi = forced_hi
+        runs.append((lo, hi - lo))
+        lo = hi
+
+        # keep run lengths growing at least as fast as Fibonacci numbers
+        while len(runs) > 1:
+            m = len(runs) - 2
+            if ((m > 0 and runs[m - 1][1] <= runs[m][1] + runs[m + 1][1]) or
+                (m > 1 and runs[m - 2][1] <= runs[m - 1][1] + runs[m][1])):
+                if runs[m - 1][1] < runs[m + 1][1]:
+                    m -= 1
+            elif runs[m][1] > runs[m + 1][1]:
+                break
+            min_gallop = _merge_at(a, runs, m, min_gallop)
+
+    while len(runs) > 1:
+        m = len(runs) - 2
+        if m > 0 and runs[m - 1][1] < runs[m + 1][1]:
+            m -= 1
+        min_gallop = _merge_at(a, runs, m, min_gallop)
+    return a
+
+
+def _merge_at(a, runs, m, min_gallop):
+    """Merge runs[m] and runs[m + 1] and replace them with the result."""
+    start1, len1 = runs[m]
+    start2, len2 = runs[m + 1]
+    runs[m:m + 2] = [(start1, len1 + len2)]
+    return _merge_runs(a, start1, start2, start2 + len2, min_gallop)
+
+
+class _Keyed(object):
+    """Item compared by key only, to check stability."""
+    def __init__(self, key, ind):
+        self.key = key
+        self.ind = ind
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+    def __le__(self, other):
+        return self.key <= other.key
+
+    def __ge__(self, other):
+        return self.key >= other.key
+
+
+def _gen_problem(size, kind):
+    """Return a list of size integers that is sorted, reversed, sawtooth
+    (sorted runs of random length) or random."""
+    if kind == 'sorted':
+        return range(size)
+    if kind == 'reversed':
+        return range(size, 0, -1)
+    if kind == 'sawtooth':
+        a = []
+        while len(a) < size:
+            a.extend(range(random.randint(1, max(size // 10, 1))))
+        return a[:size]
+    return [random.randint(0, size) for _ in xrange(size)]
+
+
+def test_natural_merge_sort(test_cnt=100):
+    for _ in xrange(test_cnt):
+        for kind in ('sorted', 'reversed', 'sawtooth', 'random'):
+            problem = _gen_problem(random.randint(0, 3000), kind)
+            assert natural_merge_sort(problem[:]) == sorted(problem)
+
+        # few distinct keys, result must keep the original order of ties
+        problem = [_Keyed(random.randint(0, 5), i)
+                   for i in xrange(random.randint(0, 3000))]
+        result = natural_merge_sort(problem[:])
+        assert ([(x.key, x.ind) for x in result] ==
+                sorted((x.key, x.ind) for x in problem))
+
+
+def benchmark(size=10**6):
+    """Compare natural_merge_sort with merge_sort on different inputs."""
+    from mergesort import merge_sort
+    for kind in ('sorted', 'reversed', 'sawtooth', 'random'):
+        problem = _gen_problem(size, kind)
+        for sort_func in (merge_sort, natural_merge_sort):
+            a = problem[:]
+            start_time = time.time()
+            sort_func(a)
+            print '%-9s %-18s %.2fs' % (kind, sort_func.__name__,
+                                        time.time() - start_time)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    test_natural_merge_sort()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
@@ -0,0 +1,202 @@
+"""Online inversion counting.
+
+Keep the number of inversions of a stream up to date as items are appended
+(and, in window mode, as the oldest item is evicted), without recounting
+the whole prefix.
+
+Algorithm:
+def append(x):
+  inversion_cnt += number of items seen so far that are > x
+  add x to the seen items
+
+def evict():
+  x = oldest item
+  remove x from the seen items
+  inversion_cnt -= number of items seen so far that are < x
+
+The seen items are kept in a treap (a randomized balanced binary search
+tree) where every node knows the size of its subtree, so both counts take
+O(log n) expected time and the values need not be known up front.
+"""
+
+import collections
+import doctest
+import random
+
+from count_inversion import _brute_force
+
+
+class _Node(object):
+    """Treap node holding cnt copies of key."""
+    __slots__ = ('key', 'cnt', 'size', 'priority', 'left', 'right')
+
+    def __init__(self, key):
+        self.key = key
+        self.cnt = 1
+        self.size = 1
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = node.cnt + _size(node.left) + _size(node.right)
+
+
+def _rotate_right(node):
+    left = node.left
+    node.left = left.right
+    left.right = node
+    _update(node)
+    _update(left)
+    return left
+
+
+def _rotate_left(node):
+    right = node.right
+    node.right = right.left
+    right.left = node
+    _update(node)
+    _update(right)
+    return right
+
+
+def _insert(node, key):
+    """Insert key into the treap rooted at node, return the new root."""
+    if node is None:
+        return _Node(key)
+    if key == node.key:
+        node.cnt += 1
+    elif key < node.key:
+        node.left = _insert(node.left, key)
+        if node.left.priority > node.priority:
+            node = _rotate_right(node)
+    else:
+        node.right = _insert(node.right, key)
+        if node.right.priority > node.priority:
+            node = _rotate_left(node)
+    _update(node)
+    return node
+
+
+def _remove(node, key):
+    """Remove one copy of key from the treap rooted at node, return the new
+    root. key must be in the treap."""
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif node.key < key:
+        node.right = _remove(node.right, key)
+    elif node.cnt > 1:
+        node.cnt -= 1
+    elif node.left is None:
+        return node.right
+    elif node.right is None:
+        return node.left
+    elif node.left.priority > node.right.priority:
+        node = _rotate_right(node)
+        node.right = _remove(node.right, key)
+    else:
+        node = _rotate_left(node)
+        node.left = _remove(node.left, key)
+    _update(node)
+    return node
+
+
+def _count_less(node, key, or_equal=False):
+    """Return the number of keys in the treap rooted at node that are < key
+    (<= key if or_equal)."""
+    cnt = 0
+    while node is not None:
+        if key < node.key:
+            node = node.left
+        elif node.key < key:
+            cnt += _size(node.left) + node.cnt
+            node = node.right
+        else:
+            cnt += _size(node.left)
+            if or_equal:
+                cnt += node.cnt
+            break
+    return cnt
+
+
+class InversionCounter(object):
+    """Running inversion count of a stream.
+
+    With window=None every appended item is kept. Otherwise only the last
+    window items are kept: appending beyond that evicts the oldest item,
+    and evict() can be called to drop the oldest item explicitly.
+
+    >>> c = InversionCounter()
+    >>> for x in [1, 4, 2, 3, 5]: c.append(x)
+    >>> c.count()
+    2
+    >>> c = InversionCounter(window=3)
+    >>> for x in [5, 4, 3, 2]: c.append(x)
+    >>> c.count(), len(c)
+    (3, 3)
+    >>> c.evict()
+    4
+    >>> c.count()
+    1
+    """
+
+    def __init__(self, window=None):
+        if window is not None and window < 1:
+            raise ValueError('window must be at least 1, got %s' % window)
+        self.window = window
+        self._root = None
+        self._items = collections.deque()
+        self._count = 0
+
+    def append(self, x):
+        """Append x to the stream in O(log n)."""
+        self._count += len(self._items) - _count_less(self._root, x,
+                                                      or_equal=True)
+        self._root = _insert(self._root, x)
+        self._items.append(x)
+        if self.window is not None and len(self._items) > self.window:
+            self.evict()
+
+    def evict(self):
+        """Remove the oldest item in O(log n) and return it."""
+        if not self._items:
+            raise IndexError('evict from an empty InversionCounter')
+        x = self._items.popleft()
+        self._root = _remove(self._root, x)
+        self._count -= _count_less(self._root, x)
+        return x
+
+    def count(self):
+        """Return the number of inversions among the kept items."""
+        return self._count
+
+    def __len__(self):
+        return len(self._items)
+
+
+def test_inversion_counter(test_cnt=200):
+    for _ in xrange(test_cnt):
+        window = random.choice([None, random.randint(1, 20)])
+        counter = InversionCounter(window)
+        stream = []
+        for _ in xrange(random.randint(0, 60)):
+            if stream and random.random() < 0.1:
+                assert counter.evict() == stream.pop(0)
+            else:
+                x = random.randint(-10, 10)
+                counter.append(x)
+                stream.append(x)
+                if window is not None:
+                    stream = stream[-window:]
+            assert len(counter) == len(stream)
+            assert counter.count() == _brute_force(stream), stream
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_inversion_counter()
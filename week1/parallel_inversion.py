@@ -0,0 +1,120 @@
+"""Count inversions on several processes.
+
+Algorithm:
+def parallel_inversion_cnt(a, workers):
+  copy a into a shared memory array and split it into one chunk per worker
+  in parallel, for every chunk:
+    inversion_cnt += inversions inside the chunk
+    sort the chunk in place
+  while there is more than one sorted range:
+    in parallel, for every pair of adjacent sorted ranges:
+      inversion_cnt += split inversions between the two ranges
+      merge the two ranges in place
+
+Worker processes inherit the shared array when they are forked, so only
+range boundaries and counts go through the pool.
+"""
+
+import multiprocessing
+import multiprocessing.sharedctypes
+import random
+import sys
+import time
+
+from count_inversion import _brute_force
+from count_inversion import _split_inversion
+from count_inversion import inversion_cnt
+from count_inversion import inversion_cnt_bit
+import parallel_mergesort
+from parallel_mergesort import _PARALLEL_THRESHOLD
+from parallel_mergesort import _chunk_bounds
+from parallel_mergesort import _pool
+
+
+def _count_chunk(bounds):
+    """Sort _shared[start_ind:end_ind] in place, return its inversions."""
+    start_ind, end_ind = bounds
+    shared = parallel_mergesort._shared
+    cnt, shared[start_ind:end_ind] = inversion_cnt_bit(
+        shared[start_ind:end_ind], return_sorted=True)
+    return cnt
+
+
+def _merge_count(bounds):
+    """Merge the sorted ranges _shared[start_ind:mid_ind] and
+    _shared[mid_ind:end_ind] in place, return the split inversions."""
+    start_ind, mid_ind, end_ind = bounds
+    shared = parallel_mergesort._shared
+    cnt, shared[start_ind:end_ind] = _split_inversion(
+        shared[start_ind:mid_ind], shared[mid_ind:end_ind])
+    return cnt
+
+
+def parallel_inversion_cnt(a, workers=None, threshold=_PARALLEL_THRESHOLD):
+    """Count inversions in array a of integers on several processes.
+
+    workers is the number of processes, cpu count if None. Inputs shorter
+    than threshold are counted in this process.
+
+    >>> parallel_inversion_cnt([1, 4, 2, 3, 5], workers=2, threshold=0)
+    2
+    >>> parallel_inversion_cnt([6, 5, 4, 3, 2, 1], workers=4, threshold=0)
+    15
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1 or len(a) < max(threshold, workers):
+        return inversion_cnt_bit(a)
+
+    shared = multiprocessing.sharedctypes.RawArray('l', a)
+    ranges = _chunk_bounds(len(a), workers)
+    pool = _pool(workers, shared)
+    try:
+        cnt = sum(pool.map(_count_chunk, ranges))
+        while len(ranges) > 1:
+            pairs = [(ranges[i][0], ranges[i][1], ranges[i + 1][1])
+                     for i in xrange(0, len(ranges) - 1, 2)]
+            cnt += sum(pool.map(_merge_count, pairs))
+            merged = [(start_ind, end_ind) for start_ind, _, end_ind in pairs]
+            if len(ranges) % 2 == 1:
+                merged.append(ranges[-1])
+            ranges = merged
+    finally:
+        pool.close()
+        pool.join()
+    return cnt
+
+
+def test_parallel_inversion_cnt(test_cnt=20):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(0, 300)
+        problem = [random.randint(-50, 50) for _ in xrange(problem_size)]
+        workers = random.randint(1, 8)
+        cnt = parallel_inversion_cnt(problem, workers, threshold=0)
+        assert cnt == _brute_force(problem), (workers, problem)
+
+
+def benchmark(size=10**6, workers_list=(1, 2, 4, 8)):
+    """Print wall time and speedup of parallel_inversion_cnt per worker
+    count, checked against inversion_cnt."""
+    a = range(size)
+    random.shuffle(a)
+    expected, _ = inversion_cnt(a)
+    base_time = None
+    for workers in workers_list:
+        start_time = time.time()
+        cnt = parallel_inversion_cnt(a, workers)
+        elapsed = time.time() - start_time
+        assert cnt == expected, (cnt, expected)
+        if base_time is None:
+            base_time = elapsed
+        print '%d workers: %.2fs (speedup %.2f)' % (
+            workers, elapsed, base_time / elapsed)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    test_parallel_inversion_cnt()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
@@ -0,0 +1,121 @@
+"""Parallel merge sort.
+
+Algorithm:
+def parallel_merge_sort(a, workers):
+  copy a into a shared memory array
+  split the shared array into one chunk per worker
+  every worker sorts its chunk in place in the shared array
+  merge the sorted chunks with a heap (k-way merge), reading them straight
+      from the shared array
+
+Worker processes inherit the shared array when they are forked, so only the
+chunk boundaries are sent to them and nothing is pickled back. _pool and
+_shared are also used by the other parallel modules.
+"""
+
+import array
+import heapq
+import itertools
+import multiprocessing
+import multiprocessing.sharedctypes
+import random
+import sys
+import time
+
+from mergesort import merge_sort_bottom_up
+
+# Inputs shorter than this are not worth starting processes for.
+_PARALLEL_THRESHOLD = 50000
+
+# Shared array of the current job, set in worker processes by _init_worker.
+# Other modules read it as parallel_mergesort._shared.
+_shared = None
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _pool(workers, shared):
+    """Return a pool of workers processes that see shared as _shared."""
+    return multiprocessing.Pool(workers, _init_worker, (shared,))
+
+
+def _sort_chunk(bounds):
+    """Sort _shared[start_ind:end_ind] in place."""
+    start_ind, end_ind = bounds
+    aux = array.array('l', [0]) * (end_ind - start_ind)
+    merge_sort_bottom_up(_shared, aux, start_ind, end_ind)
+
+
+def _chunk_bounds(n, chunk_cnt):
+    """Split range(n) into chunk_cnt contiguous (start, end) ranges.
+
+    >>> _chunk_bounds(10, 3)
+    [(0, 3), (3, 6), (6, 10)]
+    >>> _chunk_bounds(2, 4)
+    [(0, 0), (0, 1), (1, 1), (1, 2)]
+    """
+    return [(n * i // chunk_cnt, n * (i + 1) // chunk_cnt)
+            for i in xrange(chunk_cnt)]
+
+
+def parallel_merge_sort(a, workers=None, threshold=_PARALLEL_THRESHOLD):
+    """Merge sort a of integers on several processes, return a sorted list.
+
+    workers is the number of processes, cpu count if None.  Inputs shorter
+    than threshold are sorted in this process.
+
+    >>> parallel_merge_sort([3, 1, 2, 5, 4], workers=2, threshold=0)
+    [1, 2, 3, 4, 5]
+    >>> parallel_merge_sort([2, 1])
+    [1, 2]
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1 or len(a) < max(threshold, workers):
+        return merge_sort_bottom_up(list(a))
+
+    shared = multiprocessing.sharedctypes.RawArray('l', a)
+    bounds = _chunk_bounds(len(a), workers)
+    pool = _pool(workers, shared)
+    try:
+        pool.map(_sort_chunk, bounds)
+    finally:
+        pool.close()
+        pool.join()
+    return list(heapq.merge(*[itertools.imap(shared.__getitem__,
+                                             xrange(start_ind, end_ind))
+                              for start_ind, end_ind in bounds]))
+
+
+def test_parallel_merge_sort(test_cnt=20):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(0, 3000)
+        problem = [random.randint(-1000, 1000) for _ in xrange(problem_size)]
+        workers = random.randint(1, 8)
+        result = parallel_merge_sort(problem, workers, threshold=0)
+        assert result == sorted(problem), (workers, problem_size)
+
+
+def benchmark(size=10**6, workers_list=(1, 2, 4, 8)):
+    """Print wall time and speedup of parallel_merge_sort per worker count."""
+    a = [random.randint(0, size) for _ in xrange(size)]
+    base_time = None
+    for workers in workers_list:
+        start_time = time.time()
+        parallel_merge_sort(a, workers)
+        elapsed = time.time() - start_time
+        if base_time is None:
+            base_time = elapsed
+        print '%d workers: %.2fs (speedup %.2f)' % (
+            workers, elapsed, base_time / elapsed)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    test_parallel_merge_sort()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
@@ -0,0 +1,157 @@
+"""Parallel quicksort on shared memory.
+
+Algorithm:
+def parallel_quicksort(a, workers):
+  put a in a shared memory array
+  ranges = [whole array]
+  while some range is longer than task_size:
+    partition it (three way) in this process
+    replace it by the parts < pivot and > pivot
+  hand every range to a pool of worker processes through its task queue
+  every worker introsorts its range in place in the shared array
+
+The ranges are disjoint, so workers never touch the same items and only
+range boundaries go through the queue. The pool setup is shared with the
+parallel sorts of week 1.
+"""
+
+import array
+import ctypes
+import multiprocessing
+import multiprocessing.sharedctypes
+import os
+import random
+import sys
+import time
+
+from quicksort import choose_pivot_ninther
+from quicksort import introsort
+from quicksort import partition_three_way
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'week1'))
+import parallel_mergesort
+from parallel_mergesort import _pool
+
+# Ranges shorter than this are never split into more tasks.
+_MIN_TASK_SIZE = 10000
+
+
+def _sort_range(bounds):
+    """Sort _shared[start_ind:end_ind] in place."""
+    start_ind, end_ind = bounds
+    introsort(parallel_mergesort._shared, start_ind=start_ind,
+              end_ind=end_ind)
+    return end_ind - start_ind
+
+
+def shared_array(a):
+    """Return a shared memory array of 64 bit integers holding a, which
+    parallel_quicksort sorts without copying."""
+    return multiprocessing.sharedctypes.RawArray('l', a)
+
+
+def _split_ranges(shared, task_size):
+    """Partition shared until every range is at most task_size long, return
+    the ranges still to be sorted."""
+    tasks = []
+    stack = [(0, len(shared))]
+    while stack:
+        start_ind, end_ind = stack.pop()
+        if end_ind - start_ind <= 1:
+            continue
+        if end_ind - start_ind <= task_size:
+            tasks.append((start_ind, end_ind))
+            continue
+        lt_ind, gt_ind = partition_three_way(shared, start_ind, end_ind,
+                                             choose_pivot_ninther)
+        stack.append((start_ind, lt_ind))
+        stack.append((gt_ind, end_ind))
+    return tasks
+
+
+def parallel_quicksort(a, workers=None, task_size=None):
+    """Sort a of integers in place on several processes.
+
+    a is either an array from shared_array, sorted where it is, or any
+    other mutable sequence of integers such as a list or array('l'), which
+    is copied into shared memory and back. workers is the number of
+    processes, cpu count if None. Ranges of at most task_size items (by
+    default a quarter of len(a) / workers, at least 10000) are sorted by a
+    single worker.
+
+    >>> a = [3, 1, 2, 5, 4]; parallel_quicksort(a, 2, task_size=1); a
+    [1, 2, 3, 4, 5]
+    >>> s = shared_array([2, 2, 1]); parallel_quicksort(s, 2); s[:]
+    [1, 2, 2]
+    >>> a = array.array('l', [3, 1, 2]); parallel_quicksort(a, 2, 1); a
+    array('l', [1, 2, 3])
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if task_size is None:
+        task_size = max(len(a) // (4 * workers), _MIN_TASK_SIZE)
+    if isinstance(a, ctypes.Array):
+        shared = a
+    else:
+        shared = shared_array(a)
+
+    tasks = _split_ranges(shared, task_size)
+    # longest first, so a big range does not start last
+    tasks.sort(key=lambda bounds: bounds[0] - bounds[1])
+    if workers <= 1 or len(tasks) <= 1:
+        for start_ind, end_ind in tasks:
+            introsort(shared, start_ind=start_ind, end_ind=end_ind)
+    else:
+        pool = _pool(workers, shared)
+        try:
+            for _ in pool.imap_unordered(_sort_range, tasks):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+
+    if shared is not a:
+        if isinstance(a, array.array):
+            a[:] = array.array(a.typecode, shared)
+        else:
+            a[:] = shared[:]
+
+
+def test_parallel_quicksort(test_cnt=20):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(0, 3000)
+        problem = [random.randint(-1000, random.choice([-990, 1000]))
+                   for _ in xrange(problem_size)]
+        expected = sorted(problem)
+        workers = random.randint(1, 8)
+        task_size = random.randint(1, 500)
+        typed = array.array('l', problem)
+        parallel_quicksort(problem, workers, task_size)
+        assert problem == expected, (workers, problem_size)
+        parallel_quicksort(typed, workers, task_size)
+        assert typed.tolist() == expected, (workers, problem_size)
+
+
+def benchmark(size=10**6, workers_list=(1, 2, 4, 8)):
+    """Print wall time and speedup of parallel_quicksort per worker count
+    on a shared array."""
+    a = [random.randint(0, size) for _ in xrange(size)]
+    base_time = None
+    for workers in workers_list:
+        shared = shared_array(a)
+        start_time = time.time()
+        parallel_quicksort(shared, workers)
+        elapsed = time.time() - start_time
+        if base_time is None:
+            base_time = elapsed
+        print '%d workers: %.2fs (speedup %.2f)' % (
+            workers, elapsed, base_time / elapsed)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    test_parallel_quicksort()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
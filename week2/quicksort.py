@@ -19,12 +19,111 @@ def partition(a):
         i ++
     swap a[0] and a[i-1]
     i-1 is where the pivot is after partition.
+
+introsort is the hardened version for production data:
+
+def introsort(a):
+   push the whole range with a depth limit of 2 log2(n) to a stack
+   while the stack is not empty:
+     pop a range
+     while the range is longer than the insertion sort cutoff:
+       if the depth limit is used up: heapsort the range, stop
+       partition it, push the larger side, continue with the smaller side
+     insertion sort the range
+
+Handling the smaller side first keeps the stack at O(log n) ranges, and
+the heapsort fallback keeps the worst case at O(n log n) whatever the
+pivot function does.
+
+Both sorts take a partition function. partition_three_way (Dijkstra's
+Dutch national flag) splits the range into < pivot, == pivot and > pivot,
+and the items equal to the pivot are never looked at again:
+
+def partition_three_way(a):
+    Assume that pivot is at position a[0]
+    lt, i, gt = 0, 1, n
+    while i < gt:
+      if a[i] < pivot: swap a[i] and a[lt], lt ++, i ++
+      elif a[i] > pivot: gt --, swap a[i] and a[gt]
+      else: i ++
+    a[lt:gt] are the items equal to the pivot.
+
+dual_pivot_quicksort (Yaroslavskiy) partitions around two pivots p <= q
+into three parts, < p, between p and q, and > q, and sorts all three.
+
+All sorts take an optional SortStats to profile one call: comparisons,
+swaps, partition depth, partition sizes and time spent per depth. Without
+one, nothing is recorded.
 """
 
+import collections
 import doctest
+import json
+import math
+import os
 import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import intfile
+import radix_sort
+from radix_sort import _insertion_sort
+
+# Ranges of at most this many items are insertion sorted by introsort.
+_INSERTION_SORT_CUTOFF = 16
+
+class SortStats(object):
+    """Counters for a single sort call.
+
+    >>> stats = SortStats(); quicksort([3, 1, 2], stats=stats)
+    >>> stats.comparisons, stats.swaps, stats.partitions, stats.max_depth
+    (3, 5, 2, 1)
+    >>> sorted(stats.partition_sizes.items())
+    [(2, 1), (4, 1)]
+    """
+
+    def __init__(self):
+        self.comparisons = 0
+        self.swaps = 0
+        self.partitions = 0
+        # deepest partition, the first one is at depth 0
+        self.max_depth = 0
+        # most ranges waiting on the explicit stack of a sort at once
+        self.max_stack_size = 0
+        # number of partitions by size, rounded up to a power of 2
+        self.partition_sizes = collections.Counter()
+        # seconds spent partitioning, by depth
+        self.level_seconds = collections.defaultdict(float)
+
+    def record_partition(self, size, depth, seconds):
+        self.partitions += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        self.partition_sizes[1 << (size - 1).bit_length()] += 1
+        self.level_seconds[depth] += seconds
+
+    def record_stack(self, stack_size):
+        if stack_size > self.max_stack_size:
+            self.max_stack_size = stack_size
+
+    def to_dict(self):
+        return {
+            'comparisons': self.comparisons,
+            'swaps': self.swaps,
+            'partitions': self.partitions,
+            'max_depth': self.max_depth,
+            'max_stack_size': self.max_stack_size,
+            'partition_sizes': dict((str(size), cnt) for size, cnt in
+                                    self.partition_sizes.iteritems()),
+            'level_seconds': dict((str(depth), seconds) for depth, seconds in
+                                  self.level_seconds.iteritems()),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
 
-cmp_cnt = 0
 
 def choose_pivot_first_element(a, start_ind, end_ind):
     pass  # just use first element as pivot
@@ -51,8 +150,118 @@ def choose_pivot_median_of_three(a, start_ind, end_ind):
         # last elment is median
         a[start_ind], a[end_ind-1] = a[end_ind - 1], a[start_ind]
 
+def choose_pivot_random(a, start_ind, end_ind):
+    """Use a random element."""
+    pivot_ind = random.randrange(start_ind, end_ind)
+    a[start_ind], a[pivot_ind] = a[pivot_ind], a[start_ind]
+
+def _median_of_three_ind(a, i, j, k):
+    """Return the index of the median of a[i], a[j] and a[k]."""
+    if a[i] < a[j]:
+        if a[j] < a[k]:
+            return j
+        return k if a[i] < a[k] else i
+    if a[i] < a[k]:
+        return i
+    return k if a[j] < a[k] else j
 
-def quicksort(a, pivot_func=choose_pivot_first_element):
+def choose_pivot_ninther(a, start_ind, end_ind):
+    """Use Tukey's ninther, the median of the medians of three groups of
+    three elements spread over the range. Use median of first, middle and
+    last element for short ranges."""
+    n = end_ind - start_ind
+    last_ind = end_ind - 1
+    middle_ind = start_ind + n/2
+    if n < 40:
+        pivot_ind = _median_of_three_ind(a, start_ind, middle_ind, last_ind)
+    else:
+        step = n/8
+        pivot_ind = _median_of_three_ind(
+            a,
+            _median_of_three_ind(a, start_ind, start_ind + step,
+                                 start_ind + 2*step),
+            _median_of_three_ind(a, middle_ind - step, middle_ind,
+                                 middle_ind + step),
+            _median_of_three_ind(a, last_ind - 2*step, last_ind - step,
+                                 last_ind))
+    a[start_ind], a[pivot_ind] = a[pivot_ind], a[start_ind]
+
+
+def partition_two_way(a, start_ind, end_ind, pivot_func, stats=None):
+    """Partition a[start_ind:end_ind] around the pivot chosen by pivot_func.
+
+    Return (split_ind, split_ind + 1) where split_ind is the index of the
+    pivot after the partition.
+
+    >>> a = [3, 1, 3, 5, 2]
+    >>> partition_two_way(a, 0, 5, choose_pivot_first_element)
+    (2, 3)
+    >>> a
+    [2, 1, 3, 5, 3]
+    """
+    # choose a pivot and swap it to start_ind
+    pivot_func(a, start_ind, end_ind)
+    pivot = a[start_ind]
+
+    # boundary between < pivot and > pivot, this points at the first element
+    # that is >= pivot
+    i = start_ind + 1
+    # j is boundary between partitioned elements and not partitioned elements
+    # This points at last partitioned element
+
+    for j in range(start_ind + 1, end_ind):
+        if a[j] < pivot:
+            a[i], a[j] = a[j], a[i]
+            i += 1
+    # swap pivot to middle
+    a[i - 1], a[start_ind] = a[start_ind], a[i - 1]
+    if stats is not None:
+        stats.comparisons += end_ind - start_ind - 1
+        stats.swaps += i - start_ind
+    return (i - 1, i)
+
+def partition_three_way(a, start_ind, end_ind, pivot_func, stats=None):
+    """Partition a[start_ind:end_ind] into items less than, equal to and
+    greater than the pivot chosen by pivot_func.
+
+    Return (lt_ind, gt_ind) where a[lt_ind:gt_ind] are the items equal to
+    the pivot. Items less than the pivot take one comparison, the others
+    two, and stats counts both.
+
+    >>> a = [3, 1, 3, 5, 2]
+    >>> partition_three_way(a, 0, 5, choose_pivot_first_element)
+    (2, 4)
+    >>> a
+    [1, 2, 3, 3, 5]
+    """
+    pivot_func(a, start_ind, end_ind)
+    pivot = a[start_ind]
+
+    # [start_ind, lt) < pivot, [lt, i) == pivot, [gt, end_ind) > pivot
+    lt, i, gt = start_ind, start_ind + 1, end_ind
+    while i < gt:
+        x = a[i]
+        if x < pivot:
+            a[i] = a[lt]
+            a[lt] = x
+            lt += 1
+            i += 1
+        elif pivot < x:
+            gt -= 1
+            a[i] = a[gt]
+            a[gt] = x
+        else:
+            i += 1
+    if stats is not None:
+        # lt - start_ind items were found less than the pivot by the first
+        # comparison, the rest needed a second one
+        stats.comparisons += 2 * (end_ind - start_ind - 1) - (lt - start_ind)
+        stats.swaps += lt - start_ind + end_ind - gt
+    return (lt, gt)
+
+
+def quicksort(a, pivot_func=choose_pivot_first_element,
+              partition_func=partition_two_way, stats=None):
     """Quick sort
 
     >>> a = [1, 2, 3, 4, 5]; quicksort(a); print a
@@ -63,12 +272,12 @@ def quicksort(a, pivot_func=choose_pivot_first_element):
     [1]
     >>> a = []; quicksort(a); print a
     []
+    >>> a = [2, 1, 2, 1, 2]; quicksort(a, partition_func=partition_three_way)
+    >>> print a
+    [1, 1, 2, 2, 2]
 
     """
-    global cmp_cnt
-    cmp_cnt = 0  # number of comparisions made
-
-    def _quicksort(start_ind, end_ind):
+    def _quicksort(start_ind, end_ind, depth):
         """Sort the part of a from start_ind (inclusive) to end_ind (exclusive)."""
         if end_ind - start_ind <= 1:
             return
@@ -78,34 +287,279 @@ def quicksort(a, pivot_func=choose_pivot_first_element):
         #    return
 
         # partition
-        split_ind = _partition(start_ind, end_ind)
+        if stats is None:
+            lt_ind, gt_ind = partition_func(a, start_ind, end_ind, pivot_func)
+        else:
+            start_time = time.time()
+            lt_ind, gt_ind = partition_func(a, start_ind, end_ind, pivot_func,
+                                            stats)
+            stats.record_partition(end_ind - start_ind, depth,
+                                   time.time() - start_time)
         # sort left and right of the pivot
-        _quicksort(start_ind, split_ind)
-        _quicksort(split_ind + 1, end_ind)
+        _quicksort(start_ind, lt_ind, depth + 1)
+        _quicksort(gt_ind, end_ind, depth + 1)
+
+    _quicksort(0, len(a), 0)
+
 
-    def _partition(start_ind, end_ind):
-        global cmp_cnt
-        cmp_cnt += end_ind - start_ind - 1
+def _insertion_sort_counted(a, start_ind, end_ind, stats):
+    """_insertion_sort, adding its comparisons to stats."""
+    cmps = 0
+    for i in xrange(start_ind + 1, end_ind):
+        x = a[i]
+        j = i - 1
+        while j >= start_ind:
+            cmps += 1
+            if not a[j] > x:
+                break
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+    stats.comparisons += cmps
 
-        # choose a pivot and swap it to start_ind
-        pivot_func(a, start_ind, end_ind)
-        pivot = a[start_ind]
+def _sift_down(a, start_ind, root, size):
+    """Restore the max heap a[start_ind:start_ind + size] below root, which
+    is relative to start_ind."""
+    x = a[start_ind + root]
+    child = 2*root + 1
+    while child < size:
+        right = child + 1
+        if right < size and a[start_ind + child] < a[start_ind + right]:
+            child = right
+        if not x < a[start_ind + child]:
+            break
+        a[start_ind + root] = a[start_ind + child]
+        root = child
+        child = 2*root + 1
+    a[start_ind + root] = x
 
-        # boundary between < pivot and > pivot, this points at the first element
-        # that is >= pivot
-        i = start_ind + 1
-        # j is boundary between partitioned elements and not partitioned elements
-        # This points at last partitioned element
+def _heapsort(a, start_ind, end_ind):
+    """Sort a[start_ind:end_ind] in place with heapsort."""
+    size = end_ind - start_ind
+    for root in xrange(size/2 - 1, -1, -1):
+        _sift_down(a, start_ind, root, size)
+    for last in xrange(size - 1, 0, -1):
+        a[start_ind], a[start_ind + last] = a[start_ind + last], a[start_ind]
+        _sift_down(a, start_ind, 0, last)
 
-        for j in range(start_ind + 1, end_ind):
-            if a[j] < pivot:
-                a[i], a[j] = a[j], a[i]
-                i += 1
-        # swap pivot to middle
-        a[i - 1], a[start_ind] = a[start_ind], a[i - 1]
-        return i - 1
+def introsort(a, pivot_func=choose_pivot_ninther,
+              partition_func=partition_two_way, stats=None,
+              start_ind=0, end_ind=None):
+    """Quick sort hardened against bad inputs and bad pivots.
 
-    _quicksort(0, len(a))
+    Sorts a[start_ind:end_ind] in place, all of a by default. Runs in
+    O(n log n) with O(log n) extra space for any pivot_func. stats counts
+    the comparisons made by partitions and insertion sorts, and the swaps
+    made by partitions; the heapsort fallback is not counted.
+
+    >>> a = [5, 4, 3, 2, 1]; introsort(a); print a
+    [1, 2, 3, 4, 5]
+    >>> a = range(30, 0, -1); introsort(a, choose_pivot_first_element)
+    >>> a == range(1, 31)
+    True
+    >>> a = []; introsort(a); print a
+    []
+    >>> a = [9, 3, 2, 1, 0]; introsort(a, start_ind=1, end_ind=4); print a
+    [9, 1, 2, 3, 0]
+    """
+    if end_ind is None:
+        end_ind = len(a)
+    if end_ind - start_ind < 2:
+        return
+    max_depth = 2 * int(math.log(end_ind - start_ind, 2))
+    stack = [(start_ind, end_ind, max_depth)]
+    while stack:
+        start_ind, end_ind, depth_limit = stack.pop()
+        while end_ind - start_ind > _INSERTION_SORT_CUTOFF:
+            if depth_limit == 0:
+                _heapsort(a, start_ind, end_ind)
+                break
+            depth_limit -= 1
+            if stats is None:
+                lt_ind, gt_ind = partition_func(a, start_ind, end_ind,
+                                                pivot_func)
+            else:
+                start_time = time.time()
+                lt_ind, gt_ind = partition_func(a, start_ind, end_ind,
+                                                pivot_func, stats)
+                stats.record_partition(end_ind - start_ind,
+                                       max_depth - depth_limit - 1,
+                                       time.time() - start_time)
+                stats.record_stack(len(stack) + 1)
+            if lt_ind - start_ind < end_ind - gt_ind:
+                stack.append((gt_ind, end_ind, depth_limit))
+                end_ind = lt_ind
+            else:
+                stack.append((start_ind, lt_ind, depth_limit))
+                start_ind = gt_ind
+        else:
+            if stats is None:
+                _insertion_sort(a, start_ind, end_ind)
+            else:
+                _insertion_sort_counted(a, start_ind, end_ind, stats)
+
+
+def choose_pivots_first_last(a, start_ind, end_ind):
+    pass  # just use first and last element as pivots
+
+def choose_pivots_tertiles(a, start_ind, end_ind):
+    """Use the elements at one and two thirds of the range."""
+    third = (end_ind - start_ind)/3
+    p_ind = start_ind + third
+    q_ind = end_ind - 1 - third
+    a[start_ind], a[p_ind] = a[p_ind], a[start_ind]
+    a[end_ind - 1], a[q_ind] = a[q_ind], a[end_ind - 1]
+
+def choose_pivots_random(a, start_ind, end_ind):
+    """Use two random elements."""
+    p_ind = random.randrange(start_ind, end_ind)
+    a[start_ind], a[p_ind] = a[p_ind], a[start_ind]
+    q_ind = random.randrange(start_ind + 1, end_ind)
+    a[end_ind - 1], a[q_ind] = a[q_ind], a[end_ind - 1]
+
+def _partition_dual_pivot(a, start_ind, end_ind):
+    """Partition a[start_ind:end_ind] around p = a[start_ind] and
+    q = a[end_ind - 1], p <= q. Return (lt, gt), the final indices of p
+    and q: a[start_ind:lt] < p, p <= a[lt + 1:gt] <= q, a[gt + 1:] > q."""
+    last_ind = end_ind - 1
+    p = a[start_ind]
+    q = a[last_ind]
+    # [start_ind + 1, lt) < p, [lt, i) between p and q, (gt, last_ind) > q
+    lt = start_ind + 1
+    gt = last_ind - 1
+    i = lt
+    while i <= gt:
+        x = a[i]
+        if x < p:
+            a[i] = a[lt]
+            a[lt] = x
+            lt += 1
+        elif q < x:
+            while q < a[gt] and i < gt:
+                gt -= 1
+            a[i] = a[gt]
+            a[gt] = x
+            gt -= 1
+            x = a[i]
+            if x < p:
+                a[i] = a[lt]
+                a[lt] = x
+                lt += 1
+        i += 1
+    lt -= 1
+    gt += 1
+    a[start_ind], a[lt] = a[lt], a[start_ind]
+    a[last_ind], a[gt] = a[gt], a[last_ind]
+    return (lt, gt)
+
+def _partition_dual_pivot_counted(a, start_ind, end_ind, stats):
+    """_partition_dual_pivot, adding its comparisons and swaps to stats."""
+    cmps = swaps = 0
+    last_ind = end_ind - 1
+    p = a[start_ind]
+    q = a[last_ind]
+    lt = start_ind + 1
+    gt = last_ind - 1
+    i = lt
+    while i <= gt:
+        x = a[i]
+        cmps += 1
+        if x < p:
+            a[i] = a[lt]
+            a[lt] = x
+            lt += 1
+            swaps += 1
+        else:
+            cmps += 1
+            if q < x:
+                cmps += 1
+                while q < a[gt] and i < gt:
+                    gt -= 1
+                    cmps += 1
+                a[i] = a[gt]
+                a[gt] = x
+                gt -= 1
+                swaps += 1
+                x = a[i]
+                cmps += 1
+                if x < p:
+                    a[i] = a[lt]
+                    a[lt] = x
+                    lt += 1
+                    swaps += 1
+        i += 1
+    lt -= 1
+    gt += 1
+    a[start_ind], a[lt] = a[lt], a[start_ind]
+    a[last_ind], a[gt] = a[gt], a[last_ind]
+    stats.comparisons += cmps
+    stats.swaps += swaps + 2
+    return (lt, gt)
+
+def dual_pivot_quicksort(a, pivots_func=choose_pivots_tertiles, stats=None):
+    """Quick sort with dual pivot partitioning.
+
+    pivots_func moves the two pivots to the first and last position of the
+    range, like pivot_func for quicksort. stats counts every comparison
+    made between items, one to three per item and partition.
+
+    >>> a = [3, 1, 4, 1, 5, 9, 2, 6]; dual_pivot_quicksort(a); print a
+    [1, 1, 2, 3, 4, 5, 6, 9]
+    >>> a = range(20, 0, -1); dual_pivot_quicksort(a, choose_pivots_random)
+    >>> a == range(1, 21)
+    True
+    """
+    stack = [(0, len(a), 0)]
+    while stack:
+        start_ind, end_ind, depth = stack.pop()
+        if end_ind - start_ind <= 1:
+            continue
+        last_ind = end_ind - 1
+        if stats is None:
+            pivots_func(a, start_ind, end_ind)
+            if a[last_ind] < a[start_ind]:
+                a[start_ind], a[last_ind] = a[last_ind], a[start_ind]
+            lt, gt = _partition_dual_pivot(a, start_ind, end_ind)
+        else:
+            start_time = time.time()
+            pivots_func(a, start_ind, end_ind)
+            # this and the p < q check below
+            stats.comparisons += 2
+            if a[last_ind] < a[start_ind]:
+                a[start_ind], a[last_ind] = a[last_ind], a[start_ind]
+                stats.swaps += 1
+            lt, gt = _partition_dual_pivot_counted(a, start_ind, end_ind,
+                                                   stats)
+            stats.record_partition(end_ind - start_ind, depth,
+                                   time.time() - start_time)
+            stats.record_stack(len(stack) + 1)
+
+        stack.append((start_ind, lt, depth + 1))
+        if a[lt] < a[gt]:
+            # with p == q the middle part is all equal to the pivots
+            stack.append((lt + 1, gt, depth + 1))
+        stack.append((gt + 1, end_ind, depth + 1))
+
+
+def sort(a, engine='introsort', **kwargs):
+    """Sort a in place with the named engine: 'quicksort', 'introsort',
+    'dual_pivot', or for integers 'radix_lsd' and 'radix_msd'. kwargs are
+    passed on to the engine.
+
+    >>> a = [3, -1, 2]; sort(a, 'radix_msd'); a
+    [-1, 2, 3]
+    """
+    engines = {
+        'quicksort': quicksort,
+        'introsort': introsort,
+        'dual_pivot': dual_pivot_quicksort,
+        'radix_lsd': radix_sort.radix_sort_lsd,
+        'radix_msd': radix_sort.radix_sort_msd,
+    }
+    if engine not in engines:
+        raise ValueError('unknown sort engine %r, use one of %s' % (
+            engine, ', '.join(sorted(engines))))
+    engines[engine](a, **kwargs)
 
 
 def test_quicksort(test_cnt=30):
@@ -119,6 +573,60 @@ def test_quicksort(test_cnt=30):
             quicksort(problem, pivot_func)
             assert range(problem_size) == problem
 
+def test_partition_three_way(test_cnt=30):
+    for _ in xrange(test_cnt):
+        for pivot_func in (choose_pivot_first_element,
+                           choose_pivot_median_of_three,
+                           choose_pivot_random):
+            problem_size = random.randint(0, 2000)
+            problem = [random.randint(0, random.choice([0, 3, problem_size]))
+                       for _ in xrange(problem_size)]
+            expected = sorted(problem)
+            a = problem[:]
+            quicksort(a, pivot_func, partition_three_way)
+            assert a == expected, pivot_func
+            a = problem[:]
+            introsort(a, pivot_func, partition_three_way)
+            assert a == expected, pivot_func
+
+    # all equal keys take a single partition
+    a = [7] * 100000
+    stats = SortStats()
+    quicksort(a, partition_func=partition_three_way, stats=stats)
+    assert stats.partitions == 1
+    assert stats.comparisons == 2 * (len(a) - 1)
+
+def test_introsort(test_cnt=30):
+    for _ in xrange(test_cnt):
+        for pivot_func in (choose_pivot_first_element,
+                           choose_pivot_last_element,
+                           choose_pivot_median_of_three,
+                           choose_pivot_random,
+                           choose_pivot_ninther):
+            problem_size = random.randint(0, 2000)
+            problem = [random.randint(0, random.choice([3, problem_size]))
+                       for _ in xrange(problem_size)]
+            expected = sorted(problem)
+            introsort(problem, pivot_func)
+            assert problem == expected, pivot_func
+
+    # quadratic with quicksort, and too deep for the recursion limit
+    problem = range(100000)
+    introsort(problem, choose_pivot_first_element)
+    assert problem == range(100000)
+
+def test_dual_pivot_quicksort(test_cnt=30):
+    for _ in xrange(test_cnt):
+        for pivots_func in (choose_pivots_first_last,
+                            choose_pivots_tertiles,
+                            choose_pivots_random):
+            problem_size = random.randint(0, 2000)
+            problem = [random.randint(0, random.choice([3, problem_size]))
+                       for _ in xrange(problem_size)]
+            expected = sorted(problem)
+            dual_pivot_quicksort(problem, pivots_func)
+            assert problem == expected, pivots_func
+
 def test_pivot_count():
     """test pivot count."""
     f1 = choose_pivot_first_element
@@ -141,17 +649,14 @@ def test_pivot_count():
                       ([2, 8, 9, 3, 7, 5, 10, 1, 6, 4], f2, 20),
                       ([2, 8, 9, 3, 7, 5, 10, 1, 6, 4], f3, 19),
                       ]:
-        quicksort(a, f)
-        assert cmp_cnt == cnt, '%s, %s, %s' % (f, cnt, cmp_cnt)
+        stats = SortStats()
+        quicksort(a, f, stats=stats)
+        assert stats.comparisons == cnt, '%s, %s, %s' % (
+            f, cnt, stats.comparisons)
 
 
 def read_input(file_name):
-    a = []
-    with open(file_name) as f:
-        for line in f:
-            i = int(line)
-            a.append(i)
-    return a
+    return intfile.load_ints(file_name).tolist()
 
 def solve_homework():
     for f in (choose_pivot_first_element,
@@ -159,14 +664,52 @@ def solve_homework():
               choose_pivot_median_of_three):
         a = read_input('QuickSort.txt')
         sorted_a = sorted(a)
-        quicksort(a, f)
+        stats = SortStats()
+        quicksort(a, f, stats=stats)
         assert a == sorted_a
-        print f, cmp_cnt
-        
+        print f, stats.comparisons
+
+def benchmark_partitions(size=10**5):
+    """Print comparisons, swaps and time of the single pivot, three way and
+    dual pivot partitions on QuickSort.txt and on random, sorted and
+    duplicate heavy inputs, followed by the SortStats of each run as JSON.
+
+    The single pivot partitions run inside introsort, since plain quicksort
+    goes quadratic (and too deep) on the duplicate heavy input. Every
+    engine counts every comparison it makes between items, including
+    those of introsort's insertion sorts.
+    """
+    problems = [('QuickSort.txt', read_input('QuickSort.txt')),
+                ('random', [random.randint(0, size) for _ in xrange(size)]),
+                ('sorted', range(size)),
+                ('duplicates', [random.randint(0, 9) for _ in xrange(size)])]
+    engines = [
+        ('two way', lambda a, stats: introsort(
+            a, choose_pivot_median_of_three, stats=stats)),
+        ('three way', lambda a, stats: introsort(
+            a, choose_pivot_median_of_three, partition_three_way, stats)),
+        ('dual pivot', lambda a, stats: dual_pivot_quicksort(
+            a, stats=stats))]
+    for name, problem in problems:
+        for engine_name, engine in engines:
+            a = problem[:]
+            stats = SortStats()
+            start_time = time.time()
+            engine(a, stats)
+            elapsed = time.time() - start_time
+            assert a == sorted(problem)
+            print '%-14s %-10s comparisons %10d swaps %10d %.2fs' % (
+                name, engine_name, stats.comparisons, stats.swaps, elapsed)
+            print stats.to_json()
 
 if __name__ == '__main__':
     doctest.testmod()
     test_quicksort()
+    test_introsort()
+    test_partition_three_way()
+    test_dual_pivot_quicksort()
     test_pivot_count()
 
     solve_homework()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark_partitions()
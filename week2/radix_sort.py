@@ -0,0 +1,195 @@
+"""Radix sort for integer keys.
+
+Keys are shifted by the minimum so they are non-negative, which handles
+negative numbers, then sorted one byte (digit) at a time. Only as many
+bytes as max - min needs are looked at.
+
+Algorithm:
+def radix_sort_lsd(a):
+  for every byte from the least significant one up:
+    count the items per digit
+    move the items to dst in digit order, keeping the order within a digit
+    swap a and dst
+
+def radix_sort_msd(a):   (American flag sort, in place)
+  for the most significant byte:
+    count the items per digit to find the bucket of every digit
+    swap every item into its bucket
+  sort every bucket the same way on the next byte, or with insertion sort
+      once it is short
+
+LSD needs an auxiliary buffer as big as a; MSD needs no buffer besides a
+stack of buckets.
+"""
+
+import array
+import os
+import random
+import sys
+import time
+
+# Buckets of at most this many items are insertion sorted by radix_sort_msd.
+_INSERTION_SORT_CUTOFF = 32
+
+
+def _key_range(a):
+    """Return (min, number of bytes needed for max - min)."""
+    lo = min(a)
+    span = max(a) - lo
+    byte_cnt = 0
+    while span >> (8 * byte_cnt):
+        byte_cnt += 1
+    return lo, byte_cnt
+
+
+def radix_sort_lsd(a):
+    """Sort a list or typed array of integers in place, byte by byte from
+    the least significant byte. The sort is stable.
+
+    >>> a = [170, -45, 75, -90, 802, 24, 2, 66]; radix_sort_lsd(a); a
+    [-90, -45, 2, 24, 66, 75, 170, 802]
+    >>> a = array.array('l', [3, 1, 2]); radix_sort_lsd(a); a
+    array('l', [1, 2, 3])
+    """
+    if len(a) < 2:
+        return
+    lo, byte_cnt = _key_range(a)
+    src = a
+    dst = a[:]
+    for shift in xrange(0, 8 * byte_cnt, 8):
+        counts = [0] * 256
+        for x in src:
+            counts[((x - lo) >> shift) & 255] += 1
+        if max(counts) == len(a):
+            # all items have the same digit
+            continue
+        pos = [0] * 256
+        for digit in xrange(1, 256):
+            pos[digit] = pos[digit - 1] + counts[digit - 1]
+        for x in src:
+            digit = ((x - lo) >> shift) & 255
+            dst[pos[digit]] = x
+            pos[digit] += 1
+        src, dst = dst, src
+    if src is not a:
+        a[:] = src
+
+
+def _insertion_sort(a, start_ind, end_ind):
+    """Sort a[start_ind:end_ind] in place with insertion sort."""
+    for i in xrange(start_ind + 1, end_ind):
+        x = a[i]
+        j = i - 1
+        while j >= start_ind and a[j] > x:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+def radix_sort_msd(a):
+    """Sort a list or typed array of integers in place with American flag
+    sort, from the most significant byte. Uses no auxiliary buffer.
+
+    >>> a = [170, -45, 75, -90, 802, 24, 2, 66]; radix_sort_msd(a); a
+    [-90, -45, 2, 24, 66, 75, 170, 802]
+    """
+    if len(a) < 2:
+        return
+    lo, byte_cnt = _key_range(a)
+    if byte_cnt == 0:
+        return
+    stack = [(0, len(a), 8 * (byte_cnt - 1))]
+    while stack:
+        start_ind, end_ind, shift = stack.pop()
+        if end_ind - start_ind <= _INSERTION_SORT_CUTOFF:
+            _insertion_sort(a, start_ind, end_ind)
+            continue
+
+        counts = [0] * 256
+        for i in xrange(start_ind, end_ind):
+            counts[((a[i] - lo) >> shift) & 255] += 1
+        # bucket of every digit is [starts[digit], ends[digit])
+        starts = [0] * 256
+        ends = [0] * 256
+        pos = start_ind
+        for digit in xrange(256):
+            starts[digit] = pos
+            pos += counts[digit]
+            ends[digit] = pos
+
+        # next_ind[digit] is the first item of the bucket not known to be
+        # in place yet
+        next_ind = starts[:]
+        for digit in xrange(256):
+            end = ends[digit]
+            while next_ind[digit] < end:
+                x = a[next_ind[digit]]
+                d = ((x - lo) >> shift) & 255
+                # carry x to its bucket, picking up what was there, until
+                # an item of this bucket comes back
+                while d != digit:
+                    j = next_ind[d]
+                    next_ind[d] = j + 1
+                    a[j], x = x, a[j]
+                    d = ((x - lo) >> shift) & 255
+                a[next_ind[digit]] = x
+                next_ind[digit] += 1
+
+        if shift > 0:
+            for digit in xrange(256):
+                if counts[digit] > 1:
+                    stack.append((starts[digit], ends[digit], shift - 8))
+
+
+def test_radix_sort(test_cnt=100):
+    for _ in xrange(test_cnt):
+        problem_size = random.randint(0, 3000)
+        bound = random.choice([0, 10, 1000, 2**40, 2**62])
+        problem = [random.randint(-bound, bound)
+                   for _ in xrange(problem_size)]
+        expected = sorted(problem)
+        for sort_func in (radix_sort_lsd, radix_sort_msd):
+            a = problem[:]
+            sort_func(a)
+            assert a == expected, (sort_func, bound)
+            a = array.array('l', problem)
+            sort_func(a)
+            assert a.tolist() == expected, (sort_func, bound)
+
+
+def benchmark(size=10**6):
+    """Time the radix sorts against quicksort and merge_sort on
+    QuickSort.txt, IntegerArray.txt and random integers."""
+    import quicksort
+    week1 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, 'week1')
+    sys.path.insert(0, week1)
+    from mergesort import merge_sort
+
+    problems = [
+        ('QuickSort.txt', quicksort.read_input('QuickSort.txt')),
+        ('IntegerArray.txt',
+         quicksort.read_input(os.path.join(week1, 'IntegerArray.txt'))),
+        ('random', [random.randint(-2**40, 2**40) for _ in xrange(size)])]
+    engines = [
+        ('quicksort', lambda a: quicksort.quicksort(
+            a, quicksort.choose_pivot_median_of_three)),
+        ('merge_sort', merge_sort),
+        ('radix_lsd', radix_sort_lsd),
+        ('radix_msd', radix_sort_msd)]
+    for name, problem in problems:
+        for engine_name, engine in engines:
+            a = array.array('l', problem) if 'radix' in engine_name else \
+                problem[:]
+            start_time = time.time()
+            engine(a)
+            print '%-16s %-10s %.2fs' % (name, engine_name,
+                                         time.time() - start_time)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+    test_radix_sort()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
@@ -2,6 +2,8 @@
 import math
 import random
 import datetime
+import sys
+import time
 
 class Node:
   """A node in the graph."""
@@ -121,6 +123,65 @@ def min_cut(g):
   return best_cut
 
 
+def _edge_list(g):
+  """Return (node count, edges) of g with nodes numbered from 0, every
+  undirected edge once as a pair of node numbers."""
+  ids = dict((label, i) for i, label in enumerate(g.nodes))
+  edges = []
+  for s_label, s in g.nodes.items():
+    for t in s.dest_nodes:
+      if s_label < t.label:
+        edges.append((ids[s_label], ids[t.label]))
+  return len(ids), edges
+
+
+def _find(parent, u):
+  while parent[u] != u:
+    parent[u] = parent[parent[u]]  # path halving
+    u = parent[u]
+  return u
+
+
+def min_cut_union_find(g, run_cnt=None):
+  """Karger min cut on a flat edge list, without copying g.
+
+  Contracting edges in the order of a random shuffle is the same as
+  contracting random edges one by one, so every trial shuffles the edges
+  and unions their endpoints until two components are left, then counts
+  the edges between them. A trial is O(m log n) at worst and g is not
+  modified. run_cnt defaults to the number of trials min_cut makes.
+  """
+  node_cnt, edges = _edge_list(g)
+  if run_cnt is None:
+    run_cnt = max(g.node_cnt**2*int(math.log(max(g.node_cnt, 1))), 1)
+
+  best_cut = len(edges)
+  for _ in xrange(run_cnt):
+    random.shuffle(edges)
+    parent = range(node_cnt)
+    size = [1] * node_cnt
+    component_cnt = node_cnt
+    for u, v in edges:
+      if component_cnt <= 2:
+        break
+      u = _find(parent, u)
+      v = _find(parent, v)
+      if u != v:
+        if size[u] < size[v]:
+          u, v = v, u
+        parent[v] = u
+        size[u] += size[v]
+        component_cnt -= 1
+
+    cut = 0
+    for u, v in edges:
+      if _find(parent, u) != _find(parent, v):
+        cut += 1
+    if cut < best_cut:
+      best_cut = cut
+  return best_cut
+
+
 def _brute_force(g):
   best_cut = g.edge_cnt
 
@@ -185,6 +246,9 @@ def test():
     cut = min_cut(g)
     assert cut == test_result[testcase], '%s: exepcted: %s, got: %s' % (
         test_file, test_result[testcase], cut)
+    cut = min_cut_union_find(g)
+    assert cut == test_result[testcase], '%s: exepcted: %s, got: %s' % (
+        test_file, test_result[testcase], cut)
 
 
 def test_random(test_cnt=200):
@@ -199,6 +263,9 @@ def test_random(test_cnt=200):
     cut1 = min_cut(g)
     cut2 = _brute_force(g)
     assert cut1 == cut2, 'min_cut: %s, brute_force: %s' % (cut1, cut2)
+    cut3 = min_cut_union_find(g)
+    assert cut3 == cut2, 'min_cut_union_find: %s, brute_force: %s' % (
+        cut3, cut2)
 
 
 def read_input(filename):
@@ -213,6 +280,24 @@ def read_input(filename):
   print g
   return g
 
+def benchmark(filename='kargerMinCut.txt', run_cnt=20):
+  """Time run_cnt trials of min_cut and min_cut_union_find."""
+  g = read_input(filename)
+  start_time = time.time()
+  for _ in xrange(run_cnt):
+    gc = g.deep_copy()
+    while gc.node_cnt > 2:
+      u, v = gc.pick_random_edge()
+      gc.combine_nodes(u, v)
+  print 'min_cut: %.2fs per trial' % ((time.time() - start_time) / run_cnt)
+  start_time = time.time()
+  min_cut_union_find(g, run_cnt)
+  print 'min_cut_union_find: %.4fs per trial' % (
+      (time.time() - start_time) / run_cnt)
+
+
 if __name__ == '__main__':
   test()
   test_random()
+  if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+    benchmark()
@@ -0,0 +1,260 @@
+"""Approximate quantiles of a stream in bounded memory (KLL sketch).
+
+Items are kept in compactors, one per level; an item in level h stands
+for 2^h items of the stream. Level capacities shrink geometrically
+from the top level down, so the sketch holds O(k) items.
+
+Algorithm:
+def update(x):
+  append x to level 0
+  if the sketch holds more items than the capacities allow:
+    compact the lowest full level
+
+def compact(h):
+  sort level h
+  move every other item (starting at a random one of the first two) to
+      level h + 1, drop the rest
+
+def quantile(q):
+  sort all kept items, each with weight 2^level
+  return the first item whose accumulated weight passes q * n
+
+Every compaction shifts the rank of any item by at most 2^h, in a random
+direction, so the errors mostly cancel. The rank error is about eps * n
+with k chosen from eps (see _k_for_eps). Sketches with the same k merge
+by concatenating their levels and compacting again.
+
+While the stream has at most exact_limit items nothing is compacted and
+quantiles are exact, computed with selection on a copy.
+"""
+
+import doctest
+import math
+import random
+import sys
+import time
+
+from selection import multiselect
+from selection import selection
+
+# Level capacities shrink by this factor per level below the top one.
+_CAPACITY_DECAY = 2.0 / 3
+
+# The smallest capacity of a level.
+_MIN_CAPACITY = 2
+
+
+def _k_for_eps(eps):
+    """Return the k whose rank error is about eps * n with 99% confidence.
+
+    Empirical fit of the KLL error, eps = 2.446 / k^0.9433 (k = 200 gives
+    about 1.65%).
+
+    >>> _k_for_eps(0.01)
+    341
+    """
+    return max(8, int(math.ceil((2.446 / eps) ** (1 / 0.9433))))
+
+
+class KLLSketch(object):
+    """Quantiles of a stream of comparable items.
+
+    k sets the accuracy and size of the sketch, derived from eps if None.
+    The first exact_limit items are kept as they are, with exact answers.
+
+    >>> s = KLLSketch(exact_limit=100)
+    >>> for x in xrange(100): s.update(x)
+    >>> s.quantile(0.5), s.is_exact()
+    (50, True)
+    >>> for x in xrange(100, 100000): s.update(x)
+    >>> abs(s.quantile(0.5) - 50000) < 1650, s.is_exact()
+    (True, False)
+    """
+
+    def __init__(self, eps=0.01, k=None, exact_limit=0):
+        self.k = _k_for_eps(eps) if k is None else k
+        self.exact_limit = exact_limit
+        self.n = 0
+        self._levels = [[]]
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, h):
+        depth = len(self._levels) - 1 - h
+        return max(_MIN_CAPACITY,
+                   int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def is_exact(self):
+        """Return whether every item of the stream is still kept."""
+        return len(self._levels) == 1 and len(self._levels[0]) == self.n
+
+    def _compact(self, h):
+        if h + 1 == len(self._levels):
+            self._levels.append([])
+        level = self._levels[h]
+        level.sort()
+        # an odd item out stays at this level
+        kept = [level.pop()] if len(level) % 2 else []
+        self._levels[h + 1].extend(level[random.randint(0, 1)::2])
+        self._levels[h] = kept
+
+    def _compress(self):
+        while self.n > self.exact_limit and self._size >= self._max_size:
+            for h in xrange(len(self._levels)):
+                if len(self._levels[h]) >= self._capacity(h):
+                    self._compact(h)
+                    break
+            self._size = sum(len(level) for level in self._levels)
+            self._max_size = sum(self._capacity(h)
+                                 for h in xrange(len(self._levels)))
+
+    def update(self, x):
+        """Add item x."""
+        self._levels[0].append(x)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Add the items of sketch other, which must have the same k."""
+        if other.k != self.k:
+            raise ValueError('can not merge sketches with k %d and %d' %
+                             (self.k, other.k))
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, other_level in zip(self._levels, other._levels):
+            level.extend(other_level)
+        self.n += other.n
+        self._size = sum(len(level) for level in self._levels)
+        self._max_size = sum(self._capacity(h)
+                             for h in xrange(len(self._levels)))
+        self._compress()
+
+    def _weighted_items(self):
+        """Return sorted (item, weight) of the kept items."""
+        items = []
+        for h, level in enumerate(self._levels):
+            items.extend((x, 1 << h) for x in level)
+        items.sort()
+        return items
+
+    def rank(self, x):
+        """Return the estimated number of items < x."""
+        return sum((1 << h) * sum(1 for y in level if y < x)
+                   for h, level in enumerate(self._levels))
+
+    def quantiles(self, qs):
+        """Return the estimated q-quantile for every q in qs, the item with
+        about q * n items smaller than it."""
+        if self.n == 0:
+            raise ValueError('empty sketch')
+        if self.is_exact():
+            return multiselect(self._levels[0][:],
+                               [min(int(q * self.n), self.n - 1)
+                                for q in qs])
+
+        items = self._weighted_items()
+        order = sorted(xrange(len(qs)), key=lambda i: qs[i])
+        result = [None] * len(qs)
+        ind = 0
+        weight_sum = items[0][1]
+        for i in order:
+            target = qs[i] * self.n
+            while weight_sum <= target and ind + 1 < len(items):
+                ind += 1
+                weight_sum += items[ind][1]
+            result[i] = items[ind][0]
+        return result
+
+    def quantile(self, q):
+        """Return the estimated q-quantile."""
+        if self.is_exact():
+            if self.n == 0:
+                raise ValueError('empty sketch')
+            return selection(self._levels[0][:],
+                             min(int(q * self.n), self.n - 1))
+        return self.quantiles([q])[0]
+
+
+def _max_rank_error(sketch, expected, qs):
+    """Return the largest |rank of the answer - q * n| / n over qs, expected
+    being the stream sorted."""
+    n = len(expected)
+    error = 0.0
+    for q, x in zip(qs, sketch.quantiles(qs)):
+        # any rank of an item equal to x is right
+        lo = sum(1 for y in expected if y < x)
+        hi = sum(1 for y in expected if y <= x)
+        target = min(int(q * n), n - 1)
+        if target < lo:
+            error = max(error, float(lo - target) / n)
+        elif target >= hi:
+            error = max(error, float(target - hi + 1) / n)
+    return error
+
+
+def test_kll_sketch(test_cnt=20):
+    qs = [i / 20.0 for i in xrange(21)]
+    for _ in xrange(test_cnt):
+        eps = random.choice([0.02, 0.05, 0.1])
+        n = random.randint(1, 5000)
+        stream = [random.randint(0, random.choice([10, 10**6]))
+                  for _ in xrange(n)]
+        expected = sorted(stream)
+
+        exact = KLLSketch(eps, exact_limit=n)
+        shards = [KLLSketch(eps) for _ in xrange(random.randint(1, 4))]
+        for x in stream:
+            exact.update(x)
+            random.choice(shards).update(x)
+        assert exact.is_exact()
+        assert exact.quantiles(qs) == [expected[min(int(q * n), n - 1)]
+                                       for q in qs]
+        merged = shards[0]
+        for shard in shards[1:]:
+            merged.merge(shard)
+        assert len(merged) == n
+        assert _max_rank_error(merged, expected, qs) <= 2 * eps, (eps, n)
+
+
+def benchmark(size=10**6, eps=0.01):
+    """Print update throughput, size and rank error of a sketch and of
+    merged shards, and the time of exact selection."""
+    stream = [random.random() for _ in xrange(size)]
+    qs = [i / 100.0 for i in xrange(1, 100)]
+    expected = sorted(stream)
+
+    start_time = time.time()
+    sketch = KLLSketch(eps)
+    for x in stream:
+        sketch.update(x)
+    elapsed = time.time() - start_time
+    print 'k %d: %d items/s, %d items kept' % (
+        sketch.k, size / elapsed, sum(len(l) for l in sketch._levels))
+    start_time = time.time()
+    sketch.quantiles(qs)
+    print '99 quantiles: %.3fs, max rank error %.4f' % (
+        time.time() - start_time, _max_rank_error(sketch, expected, qs))
+
+    shards = [KLLSketch(eps) for _ in xrange(8)]
+    for i, x in enumerate(stream):
+        shards[i % 8].update(x)
+    for shard in shards[1:]:
+        shards[0].merge(shard)
+    print '8 merged shards: max rank error %.4f' % _max_rank_error(
+        shards[0], expected, qs)
+
+    start_time = time.time()
+    multiselect(stream[:], [int(q * size) for q in qs])
+    print 'exact multiselect: %.2fs' % (time.time() - start_time)
+
+
+if __name__ == '__main__':
+    doctest.testmod()
+    test_kll_sketch()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
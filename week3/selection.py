@@ -3,26 +3,72 @@
 Given an unordered array, return kth smallest item.
 
 Algorithm:
-def selection(a, k, start_ind, end_ind):
-   pivot = randomly choose a pivot point between [start_ind, end_ind)
-   partition a[start_ind:end_ind) to move items <= pivot to left of the pivot
-       and move items >= pivot to right of the pivot
-   After partiton
-   p_ind_aft = index of pivot after the partition
-   if p_ind_aft == k:
-     return a[p_ind_aft]
-   elif p_ind_aft > k:
-     return selection(a, k, start_ind, p_ind_aft)
-   else
-     return selection(a, k, p_ind_aft, end_ind)
+def selection(a, k):
+   start_ind, end_ind = 0, len(a)
+   loop:
+     pivot = randomly choose a pivot between [start_ind, end_ind), or the
+         median of medians if random pivots keep doing badly
+     partition a[start_ind:end_ind) into items < pivot, == pivot, > pivot
+     if k is among the items == pivot:
+       return a[k]
+     narrow [start_ind, end_ind) to the part containing k
+
+def median_of_medians(a, start_ind, end_ind):
+   move the median of every group of 5 items to the front of the range
+   return selection of the median of those medians
+
+Random pivots take expected O(n). Only a few partitions are allowed to
+keep more than 3/4 of the range before switching to median of medians,
+which keeps at most 7/10 of the range every time, so the worst case is
+O(n). There is no recursion: the selection of the median of medians runs
+in the same loop, with the range it is for kept on a stack.
+
+def multiselect(a, ks):
+   stack = [(0, len(a), all ranks)]
+   for every (start_ind, end_ind, ranks) on the stack:
+     if there is one rank: selection within the range
+     else partition around a random pivot and push the parts < pivot and
+         > pivot that still hold some ranks
+
+Ranges that hold no rank are dropped, so every level of partitions costs
+O(n) and there are O(log m) levels before every range holds one of the m
+ranks: O(n log m) in expectation.
+
+def weighted_selection(values, weights, q):
+   target = q * total weight, below = 0
+   loop:
+     partition values (and weights with them) around a random pivot
+     if below + weight of the part < pivot reaches target:
+       narrow to the part < pivot
+     elif below + weight of the parts <= pivot reaches target:
+       return pivot
+     else:
+       below += weight of the parts <= pivot, narrow to the part > pivot
 """
 
+import bisect
 import doctest
 import random
+import sys
+import time
 
-def selection(a, k):
+# Ranges of at most this many items are finished with insertion sort.
+_INSERTION_SORT_CUTOFF = 16
+
+# After this many partitions that keep more than 3/4 of the range, pivots
+# are taken by median of medians for the rest of the selection.
+_MAX_BAD_PARTITIONS = 4
+
+
+def selection(a, k, choose_pivot_func=None):
     """Return kth order statisitics (zero based).
 
+    a is rearranged so that a[k] is the kth smallest item, smaller items
+    before it and larger items after it. choose_pivot_func(a, start_ind,
+    end_ind) returns (pivot, pivot_ind), a random item by default; pivots
+    that keep failing to shrink the range are replaced by median of
+    medians, so the worst case is O(n) whatever choose_pivot_func does.
+
     >>> selection([1, 2, 0, 3, 4], 1)
     1
     >>> selection([1, 2, 3, 0, 4], 2)
@@ -33,37 +79,247 @@ def selection(a, k):
     1
     >>> selection([1, 4, 6, 2, 0], 4)
     6
+    >>> selection(range(100000), 50000, _choose_pivot_first_element)
+    50000
     """
+    if not 0 <= k < len(a):
+        raise IndexError('k out of range')
+    if choose_pivot_func is None:
+        choose_pivot_func = _choose_pivot_random
+    return _selection(a, k, 0, len(a), choose_pivot_func)
 
-    return _selection(a, k, 0, len(a), _choose_pivot_first_element)
 
 def _choose_pivot_first_element(a, start_ind, end_ind):
     return a[start_ind], start_ind
 
+
+def _choose_pivot_random(a, start_ind, end_ind):
+    pivot_ind = random.randint(start_ind, end_ind - 1)
+    return a[pivot_ind], pivot_ind
+
+
+def _partition(a, start_ind, end_ind, pivot):
+    """Three way partition a[start_ind:end_ind] around the value pivot.
+
+    Return (lt, gt) such that a[start_ind:lt] < pivot,
+    a[lt:gt] == pivot and a[gt:end_ind] > pivot.
+
+    >>> a = [3, 1, 3, 5, 0, 3]; _partition(a, 0, len(a), 3), a
+    ((2, 5), [1, 0, 3, 3, 3, 5])
+    """
+    lt, i, gt = start_ind, start_ind, end_ind
+    while i < gt:
+        x = a[i]
+        if x < pivot:
+            a[lt], a[i] = x, a[lt]
+            lt += 1
+            i += 1
+        elif x > pivot:
+            gt -= 1
+            a[gt], a[i] = x, a[gt]
+        else:
+            i += 1
+    return lt, gt
+
+
+def _insertion_sort(a, start_ind, end_ind):
+    """Sort a[start_ind:end_ind] in place with insertion sort."""
+    for i in xrange(start_ind + 1, end_ind):
+        x = a[i]
+        j = i - 1
+        while j >= start_ind and a[j] > x:
+            a[j + 1] = a[j]
+            j -= 1
+        a[j + 1] = x
+
+
+def _move_group_medians(a, start_ind, end_ind):
+    """Move the median of every group of 5 items of a[start_ind:end_ind]
+    to the front of the range, return the number of groups."""
+    group_cnt = 0
+    for i in xrange(start_ind, end_ind, 5):
+        group_end = min(i + 5, end_ind)
+        _insertion_sort(a, i, group_end)
+        median_ind = (i + group_end - 1) // 2
+        front_ind = start_ind + group_cnt
+        a[front_ind], a[median_ind] = a[median_ind], a[front_ind]
+        group_cnt += 1
+    return group_cnt
+
+
 def _selection(a, k, start_ind, end_ind, choose_pivot_func):
-    """Return kth order statistic for a between start_ind and end_ind."""
-    # choose a pivot
-    pivot, pivot_ind = choose_pivot_func(a, start_ind, end_ind)
-
-    # move pivot to begining of the section
-    a[start_ind], a[pivot_ind] = pivot, a[start_ind]
-
-    # move items <= pivot to left of the pivot, >= pivot to right of the pivot
-    right_to_pivot_pos = start_ind + 1
-    for i in range(start_ind + 1, end_ind):
-	if a[i] < pivot:
-	    a[i], a[right_to_pivot_pos] = a[right_to_pivot_pos], a[i]
-	    right_to_pivot_pos += 1
-    # swap pivot item to its location
-    pivot_pos = right_to_pivot_pos - 1
-    a[pivot_pos], a[start_ind] = a[start_ind], a[pivot_pos]
-
-    if pivot_pos == k:
-	return a[k]
-    elif pivot_pos > k:
-	return _selection(a, k, start_ind, pivot_pos, choose_pivot_func)
-    else:
-	return _selection(a, k, pivot_pos + 1, end_ind, choose_pivot_func)
+    """Return kth order statistic for a between start_ind and end_ind.
+
+    The range is narrowed in place. A median of medians pivot needs the
+    median of the group medians first; that selection is done by the same
+    loop, with the narrowed range saved on the pending stack meanwhile.
+    """
+    pending = []
+    bad_partition_cnt = 0
+    pivot = None
+    while True:
+        size = end_ind - start_ind
+        if pivot is None and size > _INSERTION_SORT_CUTOFF:
+            if bad_partition_cnt < _MAX_BAD_PARTITIONS:
+                pivot, _ = choose_pivot_func(a, start_ind, end_ind)
+            else:
+                group_cnt = _move_group_medians(a, start_ind, end_ind)
+                pending.append((k, start_ind, end_ind))
+                k = start_ind + group_cnt // 2
+                end_ind = start_ind + group_cnt
+                continue
+
+        if pivot is None:
+            _insertion_sort(a, start_ind, end_ind)
+        else:
+            lt, gt = _partition(a, start_ind, end_ind, pivot)
+            pivot = None
+            if k < lt:
+                end_ind = lt
+            elif k >= gt:
+                start_ind = gt
+            if k < lt or k >= gt:
+                if 4 * (end_ind - start_ind) > 3 * size:
+                    bad_partition_cnt += 1
+                continue
+
+        # a[k] is in place within the current range
+        if not pending:
+            return a[k]
+        pivot = a[k]
+        k, start_ind, end_ind = pending.pop()
+
+
+def multiselect(a, ks):
+    """Return the kth order statistic for every k in ks, in the order of ks.
+
+    a is rearranged so that every a[k] is the kth smallest item, with
+    smaller items before it and larger items after it.
+
+    >>> multiselect([5, 1, 4, 2, 3, 0], [4, 0, 2])
+    [4, 0, 2]
+    """
+    for k in ks:
+        if not 0 <= k < len(a):
+            raise IndexError('k out of range')
+    ranks = sorted(set(ks))
+    # (start_ind, end_ind, ranks_start, ranks_end): the ranks in
+    # a[start_ind:end_ind] are ranks[ranks_start:ranks_end]
+    stack = [(0, len(a), 0, len(ranks))]
+    while stack:
+        start_ind, end_ind, ranks_start, ranks_end = stack.pop()
+        if ranks_start == ranks_end:
+            continue
+        if ranks_end - ranks_start == 1:
+            _selection(a, ranks[ranks_start], start_ind, end_ind,
+                       _choose_pivot_random)
+            continue
+        if end_ind - start_ind <= _INSERTION_SORT_CUTOFF:
+            _insertion_sort(a, start_ind, end_ind)
+            continue
+        pivot, _ = _choose_pivot_random(a, start_ind, end_ind)
+        lt, gt = _partition(a, start_ind, end_ind, pivot)
+        lt_rank = bisect.bisect_left(ranks, lt, ranks_start, ranks_end)
+        gt_rank = bisect.bisect_left(ranks, gt, ranks_start, ranks_end)
+        stack.append((start_ind, lt, ranks_start, lt_rank))
+        stack.append((gt, end_ind, gt_rank, ranks_end))
+    return [a[k] for k in ks]
+
+
+def partial_sort(a, k):
+    """Rearrange a so that a[:k] are its k smallest items in order.
+
+    Partitions at k first, so only k items are sorted: O(n + k log k).
+
+    >>> a = [5, 1, 4, 2, 3, 0]; partial_sort(a, 3); a[:3]
+    [0, 1, 2]
+    """
+    k = min(k, len(a))
+    if k <= 0:
+        return
+    if k < len(a):
+        _selection(a, k - 1, 0, len(a), _choose_pivot_random)
+    a[:k] = sorted(a[:k])
+
+
+def _partition_weighted(values, weights, start_ind, end_ind, pivot):
+    """_partition of values[start_ind:end_ind], moving weights along with
+    values. Return (lt, gt)."""
+    lt, i, gt = start_ind, start_ind, end_ind
+    while i < gt:
+        x = values[i]
+        if x < pivot:
+            values[lt], values[i] = x, values[lt]
+            weights[lt], weights[i] = weights[i], weights[lt]
+            lt += 1
+            i += 1
+        elif x > pivot:
+            gt -= 1
+            values[gt], values[i] = x, values[gt]
+            weights[gt], weights[i] = weights[i], weights[gt]
+        else:
+            i += 1
+    return lt, gt
+
+
+def weighted_selection(values, weights, q=0.5):
+    """Return the weighted q-quantile of values: the smallest value v such
+    that the weights of the values <= v add up to at least q of the total
+    weight. q=0.5 gives the weighted median.
+
+    values and weights are parallel buffers (lists or arrays) and are
+    rearranged together. Expected O(n).
+
+    >>> weighted_selection([1, 2, 3, 4], [1, 1, 1, 1])
+    2
+    >>> weighted_selection([1, 2, 3, 4], [1, 1, 1, 5])
+    4
+    >>> weighted_selection([3, 1, 2], [0.2, 0.5, 0.3], 0.6)
+    2
+    """
+    if len(values) != len(weights):
+        raise ValueError('values and weights differ in length')
+    if not 0 <= q <= 1:
+        raise ValueError('q must be in [0, 1]')
+    total = 0
+    for w in weights:
+        if w < 0:
+            raise ValueError('negative weight')
+        total += w
+    if total <= 0:
+        raise ValueError('total weight must be positive')
+
+    target = q * total
+    # weight of values[:start_ind], all smaller than values[start_ind:]
+    below = 0
+    start_ind, end_ind = 0, len(values)
+    while True:
+        pivot, _ = _choose_pivot_random(values, start_ind, end_ind)
+        lt, gt = _partition_weighted(values, weights, start_ind, end_ind,
+                                     pivot)
+        lt_weight = sum(weights[i] for i in xrange(start_ind, lt))
+        eq_weight = sum(weights[i] for i in xrange(lt, gt))
+        if lt > start_ind and below + lt_weight >= target:
+            end_ind = lt
+        elif below + lt_weight + eq_weight >= target or gt == end_ind:
+            # gt == end_ind only if rounding kept the sum below target
+            return pivot
+        else:
+            below += lt_weight + eq_weight
+            start_ind = gt
+
+
+def _weighted_selection_by_sort(values, weights, q=0.5):
+    """weighted_selection by sorting (value, weight) pairs, for tests."""
+    target = q * sum(weights)
+    below = 0
+    pairs = sorted(zip(values, weights))
+    for v, w in pairs:
+        below += w
+        if below >= target:
+            return v
+    return pairs[-1][0]
+
 
 def test_selection(test_cnt=3000):
     for _ in xrange(test_cnt):
@@ -74,6 +330,117 @@ def test_selection(test_cnt=3000):
 	if k >= problem_size: continue
 	assert selection(problem, k) == k
 
+def _gen_problem(size, kind):
+    """Return size integers: 'sorted', 'reversed', 'organ_pipe' (up then
+    down) or 'random'."""
+    if kind == 'sorted':
+        return range(size)
+    if kind == 'reversed':
+        return range(size, 0, -1)
+    if kind == 'organ_pipe':
+        return range(size // 2) + range((size + 1) // 2, 0, -1)
+    return [random.randint(0, size) for _ in xrange(size)]
+
+
+def test_selection_hardened(test_cnt=300):
+    kinds = ['sorted', 'reversed', 'organ_pipe', 'random']
+    for _ in xrange(test_cnt):
+        problem = _gen_problem(random.randint(1, 2000), random.choice(kinds))
+        if random.random() < 0.3:
+            problem = [x % 7 for x in problem]
+        expected = sorted(problem)
+        k = random.randint(0, len(problem) - 1)
+        for choose_pivot_func in (None, _choose_pivot_first_element):
+            a = problem[:]
+            assert selection(a, k, choose_pivot_func) == expected[k]
+            assert max(a[:k] or [expected[k]]) <= a[k] <= min(a[k:])
+    # the fallback alone, as if every random pivot had done badly
+    global _MAX_BAD_PARTITIONS
+    saved, _MAX_BAD_PARTITIONS = _MAX_BAD_PARTITIONS, 0
+    try:
+        for size in (1, 17, 100, 5000):
+            problem = _gen_problem(size, 'random')
+            k = random.randint(0, size - 1)
+            assert selection(problem[:], k) == sorted(problem)[k]
+    finally:
+        _MAX_BAD_PARTITIONS = saved
+
+
+def test_multiselect(test_cnt=300):
+    kinds = ['sorted', 'reversed', 'organ_pipe', 'random']
+    for _ in xrange(test_cnt):
+        problem = _gen_problem(random.randint(1, 2000), random.choice(kinds))
+        if random.random() < 0.3:
+            problem = [x % 7 for x in problem]
+        expected = sorted(problem)
+        ks = [random.randint(0, len(problem) - 1)
+              for _ in xrange(random.randint(0, 50))]
+        a = problem[:]
+        assert multiselect(a, ks) == [expected[k] for k in ks]
+        for k in ks:
+            assert max(a[:k] or [a[k]]) <= a[k] <= min(a[k:])
+        k = random.randint(0, len(problem) + 1)
+        a = problem[:]
+        partial_sort(a, k)
+        assert a[:k] == expected[:k]
+        assert sorted(a) == expected
+
+
+def test_weighted_selection(test_cnt=300):
+    for _ in xrange(test_cnt):
+        n = random.randint(1, 500)
+        values = [random.randint(0, random.choice([5, 1000]))
+                  for _ in xrange(n)]
+        weights = [random.choice([0, 1, random.randint(0, 100)])
+                   for _ in xrange(n)]
+        weights[random.randint(0, n - 1)] += 1
+        q = random.choice([0, 0.25, 0.5, random.random(), 1])
+        expected = _weighted_selection_by_sort(values, weights, q)
+        pairs = sorted(zip(values, weights))
+        assert weighted_selection(values, weights, q) == expected, q
+        assert sorted(zip(values, weights)) == pairs
+
+
+def benchmark(size=10**6):
+    """Time selecting the median with random pivots and with first element
+    pivots (only the median of medians fallback keeps those linear on
+    sorted input), against sorting."""
+    for kind in ['sorted', 'reversed', 'organ_pipe', 'random']:
+        problem = _gen_problem(size, kind)
+        for name, choose_pivot_func in [
+                ('random pivot', _choose_pivot_random),
+                ('first element', _choose_pivot_first_element)]:
+            a = problem[:]
+            start_time = time.time()
+            selection(a, size // 2, choose_pivot_func)
+            print '%-10s %-13s %.2fs' % (kind, name, time.time() - start_time)
+        a = problem[:]
+        start_time = time.time()
+        a.sort()
+        print '%-10s %-13s %.2fs' % (kind, 'sort', time.time() - start_time)
+
+
+
+def benchmark_multiselect(size=10**6, percentiles=range(1, 100)):
+    """Time multiselect of percentiles against one selection per rank."""
+    problem = _gen_problem(size, 'random')
+    ks = [size * p // 100 for p in percentiles]
+    a = problem[:]
+    start_time = time.time()
+    multiselect(a, ks)
+    print '%d ranks multiselect: %.2fs' % (len(ks), time.time() - start_time)
+    start_time = time.time()
+    for k in ks:
+        selection(problem[:], k)
+    print '%d ranks selection: %.2fs' % (len(ks), time.time() - start_time)
+
+
 if __name__ == '__main__':
     doctest.testmod()
     test_selection()
+    test_selection_hardened()
+    test_multiselect()
+    test_weighted_selection()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
+        benchmark_multiselect()
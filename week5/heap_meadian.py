@@ -5,7 +5,13 @@ so far.
 
 import doctest
 import heapq
+import os
 import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import intfile
 
 
 class Heap:
@@ -112,12 +118,7 @@ def random_tests(test_cnt=3000):
 
 
 def read_input(file_name):
-    int_array = []
-    with open(file_name) as f:
-        for line in f:
-            x = int(line)
-            int_array.append(x)
-    return int_array
+    return intfile.load_ints(file_name).tolist()
 
 
 if __name__ == '__main__':
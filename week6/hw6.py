@@ -10,6 +10,13 @@ file that satisfy x+y=t. (NOTE: ensuring distinctness requires a one-line
 addition to the algorithm from lecture.)
 """
 
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+import intfile
+
 def two_sum(int_array, lb, ub):
     """return number of pairs in int_array whose sum is between lb and ub.
 
@@ -38,12 +45,7 @@ def two_sum(int_array, lb, ub):
     return len(sum_hash)
 
 def read_input(file_name):
-    int_array = []
-    with open(file_name) as f:
-        for line in f:
-            x = int(line)
-            int_array.append(x)
-    return int_array
+    return intfile.load_ints(file_name).tolist()
 
 
 def test_two_sum():